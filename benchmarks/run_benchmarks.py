@@ -0,0 +1,223 @@
+#!/usr/local/bin/python3
+
+"""Runs the Lox benchmark suite and checks it against a baseline.
+
+Usage: run_benchmarks.py [--engine E] [--scanner S] [-O] [--repeat N]
+                         [--json FILE] [--baseline FILE] [--threshold PCT]
+                         [--check | --save-baseline] [benchmark ...]
+
+Every benchmark is scanned, parsed, resolved and executed separately so each
+phase can be timed on its own; the fastest of --repeat runs is reported for
+each phase. Output printed by a benchmark must match its "// expect:" lines.
+
+Compared with the baseline, a phase that got slower than the baseline by more than
+--threshold percent (and by more than a millisecond, to ignore noise in
+tiny phases) is a regression and the runner exits with status 1. Only a
+baseline recorded with the same engine, scanner, -O and --parse-size is
+compared. With --check, a missing or incompatible baseline is an error
+(status 2) rather than skipped. --save-baseline writes the results to the
+baseline file instead.
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import glob
+import argparse
+import platform
+import contextlib
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The interpreter modules live in the parent directory and use top-level
+# imports, so it has to come first on the path (ahead of the stdlib token).
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from error_handler import ErrorHandler
+from parser import Parser
+from resolver import Resolver
+from optimizer import Optimizer
+from type_inference import TypeInference
+from lox import ENGINES, SCANNERS
+from scanner_benchmark import generate
+
+PHASES = ["scan", "parse", "resolve", "optimize", "execute"]
+
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+
+# Not stored in the repo: a large generated program that only stresses the
+# front end. Its classes are declared but never instantiated.
+PARSE_BENCHMARK = "parse_large"
+
+# Seconds a phase may slow down by before the threshold applies.
+NOISE_FLOOR = 0.001
+
+def loadBenchmarks(names, parseSize):
+    benchmarks = {}
+    for path in sorted(glob.glob(os.path.join(HERE, "*.lox"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r") as f:
+            benchmarks[name] = f.read()
+    benchmarks[PARSE_BENCHMARK] = ("class Base { init(x) {} }\n" +
+                                   generate(int(parseSize * 1e6)))
+    if names:
+        missing = [name for name in names if name not in benchmarks]
+        if missing:
+            raise SystemExit(f"Unknown benchmark(s): {', '.join(missing)}")
+        benchmarks = {name: benchmarks[name] for name in names}
+    return benchmarks
+
+def expectedOutput(source):
+    prefix = "// expect: "
+    return [line[len(prefix):] for line in source.splitlines() if line.startswith(prefix)]
+
+def runOnce(source, engine, scanner, optimize):
+    """Runs source through every phase. Returns the seconds spent in each
+    phase and the printed output lines.
+    """
+    error_handler = ErrorHandler()
+    times = {}
+
+    start = time.perf_counter()
+    tokens = SCANNERS[scanner](error_handler, source).scanTokens()
+    times["scan"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    statements = Parser(error_handler, tokens).parse()
+    times["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    Resolver(error_handler).resolve(statements)
+    times["resolve"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if optimize:
+        statements = Optimizer(error_handler).optimize(statements)
+        TypeInference().infer(statements)
+    times["optimize"] = time.perf_counter() - start
+
+    if error_handler.had_error:
+        raise SystemExit("Benchmark failed to compile.")
+
+    interpreter = ENGINES[engine](error_handler)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        interpreter.interpret(statements)
+        times["execute"] = time.perf_counter() - start
+
+    if error_handler.had_runtime_error:
+        raise SystemExit(f"Benchmark failed at runtime:\n{output.getvalue()}")
+    return times, output.getvalue().splitlines()
+
+def runBenchmark(name, source, args):
+    expected = expectedOutput(source)
+    runs = []
+    for _ in range(args.repeat):
+        times, output = runOnce(source, args.engine, args.scanner, args.optimize)
+        if expected and output != expected:
+            raise SystemExit(f"{name}: printed {output}, expected {expected}")
+        runs.append(times)
+
+    result = {phase: min(run[phase] for run in runs) for phase in PHASES}
+    result["total"] = sum(result[phase] for phase in PHASES)
+    return result
+
+def compare(results, baseline, threshold):
+    """Returns a description of every phase slower than the baseline by more
+    than threshold percent.
+    """
+    regressions = []
+    for name, phases in results.items():
+        previous = baseline.get("benchmarks", {}).get(name)
+        if previous is None:
+            continue
+        for phase, seconds in phases.items():
+            before = previous.get(phase)
+            if before is None or seconds - before <= NOISE_FLOOR:
+                continue
+            change = (seconds - before) / before * 100 if before else float("inf")
+            if change > threshold:
+                regressions.append(f"{name} {phase}: {before * 1000:.1f} ms -> "
+                                   f"{seconds * 1000:.1f} ms (+{change:.0f}%)")
+    return regressions
+
+def printTable(results):
+    print(f"{'benchmark':<16}" + "".join(f"{phase:>10}" for phase in PHASES + ["total"]) + "  (ms)")
+    for name, phases in results.items():
+        print(f"{name:<16}" + "".join(f"{phases[phase] * 1000:>10.1f}" for phase in PHASES + ["total"]))
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(prog="run_benchmarks.py")
+    argparser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                           help="benchmarks to run (default: all)")
+    argparser.add_argument("--engine", choices=ENGINES.keys(), default="tree",
+                           help="execution engine (default: tree)")
+    argparser.add_argument("--scanner", choices=SCANNERS.keys(), default="classic",
+                           help="scanner (default: classic)")
+    argparser.add_argument("-O", dest="optimize", action="store_true",
+                           help="run the optimizer and type inference phase")
+    argparser.add_argument("--repeat", type=int, default=3,
+                           help="runs per benchmark; the fastest is reported (default: 3)")
+    argparser.add_argument("--parse-size", type=float, default=1,
+                           help=f"size in MB of the generated {PARSE_BENCHMARK} input (default: 1)")
+    argparser.add_argument("--json", metavar="FILE",
+                           help="write the results as JSON to FILE ('-' for stdout)")
+    argparser.add_argument("--baseline", metavar="FILE", default=DEFAULT_BASELINE,
+                           help="baseline to compare against (default: benchmarks/baseline.json)")
+    argparser.add_argument("--threshold", type=float, default=10,
+                           help="percent slowdown of a phase that counts as a regression (default: 10)")
+    argparser.add_argument("--check", action="store_true",
+                           help="fail unless a baseline recorded with the same options exists")
+    argparser.add_argument("--save-baseline", action="store_true",
+                           help="write the results to the baseline file instead of comparing")
+    args = argparser.parse_args()
+    if args.check and args.save_baseline:
+        argparser.error("--check and --save-baseline cannot be combined")
+
+    results = {}
+    for name, source in loadBenchmarks(args.benchmarks, args.parse_size).items():
+        results[name] = runBenchmark(name, source, args)
+
+    report = {
+        "engine": args.engine,
+        "scanner": args.scanner,
+        "optimize": args.optimize,
+        "parseSize": args.parse_size,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "benchmarks": results,
+    }
+
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        printTable(results)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}.", file=sys.stderr)
+        exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; record one with --save-baseline.", file=sys.stderr)
+        exit(2 if args.check else 0)
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    options = ("engine", "scanner", "optimize", "parseSize")
+    if any(baseline.get(option) != report[option] for option in options):
+        recorded = ", ".join(f"{option}={baseline.get(option)}" for option in options)
+        print(f"Baseline {args.baseline} was recorded with other options ({recorded}); not comparing.",
+              file=sys.stderr)
+        exit(2 if args.check else 0)
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    exit(1 if regressions else 0)
@@ -0,0 +1,104 @@
+#!/usr/local/bin/python3
+
+"""Compares Scanner and RegexScanner on large inputs.
+
+Usage: scanner_benchmark.py [--size MB] [--repeat N] [script ...]
+
+Without scripts a Lox program of roughly --size megabytes is generated.
+Both scanners must produce identical tokens and errors; the run fails
+otherwise.
+"""
+
+import os
+import io
+import sys
+import time
+import argparse
+import contextlib
+
+# The interpreter modules live in the parent directory and use top-level
+# imports, so it has to come first on the path (ahead of the stdlib token).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from error_handler import ErrorHandler
+from scanner import Scanner
+from regex_scanner import RegexScanner
+
+SCANNERS = [("classic", Scanner), ("regex", RegexScanner)]
+
+TEMPLATE = '''// Function {n}: exercises every kind of token.
+fun f{n}(a, b) {{
+  var total = 0;
+  for (var i = 0; i < a; i = i + 1) {{
+    if (i >= b and !(i == 3) or i != 4) total = total + i * 2.5 / 1;
+    else total = total - 1;
+  }}
+  print "result of f{n}: " + "multi
+line";
+  return total <= b;
+}}
+
+class C{n} < Base {{
+  init(x) {{ this.x = x; super.init(nil); }}
+  get() {{ return this.x > true or false; }}
+}}
+'''
+
+def generate(size):
+    parts = []
+    length = 0
+    n = 0
+    while length < size:
+        part = TEMPLATE.format(n=n)
+        parts.append(part)
+        length += len(part)
+        n += 1
+    return "".join(parts)
+
+def scan(scanner, source):
+    error_handler = ErrorHandler()
+    errors = io.StringIO()
+    with contextlib.redirect_stdout(errors):
+        start = time.perf_counter()
+        tokens = scanner(error_handler, source).scanTokens()
+        elapsed = time.perf_counter() - start
+    stream = [(t.token_type, t.lexeme, t.literal, t.line) for t in tokens]
+    return elapsed, stream, errors.getvalue()
+
+def benchmark(name, source, repeat):
+    print(f"{name}: {len(source) / 1e6:.2f} MB")
+    results = {}
+    for label, scanner in SCANNERS:
+        times = []
+        for _ in range(repeat):
+            elapsed, stream, errors = scan(scanner, source)
+            times.append(elapsed)
+        results[label] = (min(times), stream, errors)
+        print(f"  {label:<8} {min(times):8.3f}s  {len(stream) / min(times) / 1e6:6.2f} M tokens/s")
+
+    baseline = results["classic"]
+    for label, result in results.items():
+        if result[1:] != baseline[1:]:
+            print(f"  {label} output differs from classic", file=sys.stderr)
+            return False
+    print(f"  speedup  {baseline[0] / results['regex'][0]:8.2f}x ({len(baseline[1])} tokens)")
+    return True
+
+if __name__ == "__main__":
+    argparser = argparse.ArgumentParser(prog="scanner_benchmark.py")
+    argparser.add_argument("scripts", nargs="*", metavar="script")
+    argparser.add_argument("--size", type=float, default=4,
+                           help="size in MB of the generated input (default: 4)")
+    argparser.add_argument("--repeat", type=int, default=3,
+                           help="runs per scanner; the fastest is reported (default: 3)")
+    args = argparser.parse_args()
+
+    inputs = []
+    for script in args.scripts:
+        with open(script, "r") as f:
+            inputs.append((script, f.read()))
+    if not inputs:
+        inputs.append(("generated", generate(int(args.size * 1e6))))
+
+    ok = all([benchmark(name, source, args.repeat) for name, source in inputs])
+    exit(0 if ok else 1)
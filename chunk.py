@@ -0,0 +1,63 @@
+#!/usr/local/bin/python3
+
+from enum import IntEnum
+
+OpCode = IntEnum("OpCode",
+                 "CONSTANT NIL TRUE FALSE POP \
+                  GET_LOCAL SET_LOCAL GET_GLOBAL DEFINE_GLOBAL SET_GLOBAL \
+                  GET_UPVALUE SET_UPVALUE GET_PROPERTY SET_PROPERTY GET_SUPER \
+                  GET_METHOD GET_SUPER_METHOD \
+                  EQUAL NOT_EQUAL GREATER GREATER_EQUAL LESS LESS_EQUAL \
+                  ADD SUBTRACT MULTIPLY DIVIDE NOT NEGATE \
+                  PRINT JUMP JUMP_IF_FALSE LOOP \
+                  CALL INVOKE TAIL_CALL TAIL_INVOKE \
+                  CLOSURE CLOSE_UPVALUE RETURN \
+                  CLASS INHERIT METHOD")
+
+# Number of inline operands that follow each instruction. CLOSURE is
+# additionally followed by an (isLocal, index) pair per captured upvalue.
+OPERAND_COUNTS = {op: 0 for op in OpCode}
+OPERAND_COUNTS.update({
+    OpCode.CONSTANT: 1,
+    OpCode.GET_LOCAL: 1,
+    OpCode.SET_LOCAL: 1,
+    OpCode.GET_GLOBAL: 1,
+    OpCode.DEFINE_GLOBAL: 1,
+    OpCode.SET_GLOBAL: 1,
+    OpCode.GET_UPVALUE: 1,
+    OpCode.SET_UPVALUE: 1,
+    OpCode.GET_PROPERTY: 1,
+    OpCode.SET_PROPERTY: 1,
+    OpCode.GET_SUPER: 1,
+    OpCode.GET_METHOD: 1,
+    OpCode.GET_SUPER_METHOD: 1,
+    OpCode.JUMP: 1,
+    OpCode.JUMP_IF_FALSE: 1,
+    OpCode.LOOP: 1,
+    OpCode.CALL: 1,
+    OpCode.INVOKE: 1,
+    OpCode.TAIL_CALL: 1,
+    OpCode.TAIL_INVOKE: 1,
+    OpCode.CLOSURE: 1,
+    OpCode.CLASS: 1,
+    OpCode.METHOD: 1,
+})
+
+class Chunk:
+    def __init__(self):
+        self.code = []
+        self.lines = []
+        self.constants = []
+        self.constantIndexes = {}
+
+    def write(self, value, line):
+        self.code.append(value)
+        self.lines.append(line)
+
+    def addConstant(self, value):
+        # Reuse slots for equal constants, but never conflate 1.0 with true.
+        key = (type(value), value)
+        if key not in self.constantIndexes:
+            self.constantIndexes[key] = len(self.constants)
+            self.constants.append(value)
+        return self.constantIndexes[key]
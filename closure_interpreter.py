@@ -0,0 +1,509 @@
+#!/usr/local/bin/python3
+
+import operator
+
+from lox_types import TokenType as TT
+from expr import *
+from stmt import *
+from environment import Environment
+from interpreter import Interpreter
+from lox_function import LoxFunction
+from lox_callable import LoxCallable
+from lox_return import LoxReturn
+from lox_class import LoxClass
+from lox_instance import LoxInstance
+from error_handler import LoxRuntimeException
+from inline_cache import siteCache
+from native import NativeError
+from rope import concatenate
+
+# Closure-compiling execution engine.
+#
+# Instead of dispatching every node through Interpreter.visit, the resolved
+# AST is walked once and each node is turned into a Python closure that
+# takes the current Environment and evaluates (or executes) the node.
+# Operators, variable distances and branches are all decided at compile
+# time, so running a program is just a chain of direct closure calls.
+
+NUMBER_OPERATORS = {
+    TT.GREATER: operator.gt,
+    TT.GREATER_EQUAL: operator.ge,
+    TT.LESS: operator.lt,
+    TT.LESS_EQUAL: operator.le,
+    TT.MINUS: operator.sub,
+    TT.SLASH: operator.floordiv,
+    TT.STAR: operator.mul,
+}
+
+class ClosureFunction(LoxFunction):
+    __slots__ = ("body",)
+
+    def __init__(self, declaration, closure, isInitializer, body, receiver=None):
+        super().__init__(declaration, closure, isInitializer, receiver)
+        self.body = body
+
+    def bind(self, instance):
+        return ClosureFunction(self.declaration, self.closure, self.isInitializer, self.body, instance)
+
+    def execute(self, interpreter, values):
+        environment = Environment(self.closure, values)
+
+        profiler = interpreter.profiler
+        if profiler is not None:
+            profiler.enter(self.declaration.name)
+        try:
+            completion = self.body(environment)
+        except RecursionError:
+            # The tree-walking engines run Lox calls on the Python stack.
+            raise(LoxRuntimeException(self.declaration.name, "Stack overflow."))
+        finally:
+            if profiler is not None:
+                profiler.exit()
+
+        if self.isInitializer:
+            return values[0]
+        if completion is not None:
+            return completion.value
+
+        return None
+
+class ClosureInterpreter(Interpreter):
+    def __init__(self, error_handler):
+        super().__init__(error_handler)
+        self.compilers = {
+            AssignExpr: self.compileAssign,
+            BinaryExpr: self.compileBinary,
+            CallExpr: self.compileCall,
+            GetExpr: self.compileGet,
+            GroupingExpr: self.compileGrouping,
+            LiteralExpr: self.compileLiteral,
+            LogicalExpr: self.compileLogical,
+            SetExpr: self.compileSet,
+            SuperExpr: self.compileSuper,
+            ThisExpr: self.compileThis,
+            UnaryExpr: self.compileUnary,
+            VariableExpr: self.compileVariable,
+            BlockStmt: self.compileBlock,
+            ClassStmt: self.compileClass,
+            ExpressionStmt: self.compileExpression,
+            FunctionStmt: self.compileFunction,
+            IfStmt: self.compileIf,
+            PrintStmt: self.compilePrint,
+            ReturnStmt: self.compileReturn,
+            VariableStmt: self.compileVarDeclaration,
+            WhileStmt: self.compileWhile,
+        }
+
+    def interpret(self, statements):
+        try:
+            for statement in statements:
+                self.compile(statement)(self.globals)
+        except LoxRuntimeException as e:
+            self.error_handler.runtimeError(e)
+
+    def compile(self, node):
+        return self.compilers[type(node)](node)
+
+    def compileStatements(self, statements):
+        code = tuple(self.compile(statement) for statement in statements)
+
+        if len(code) == 1:
+            return code[0]
+
+        def run(env):
+            for statement in code:
+                completion = statement(env)
+                if completion is not None:
+                    return completion
+        return run
+
+    def compileLookUp(self, name, expr):
+        lexeme = name.lexeme
+        if expr.depth is None:
+            values = self.globals.values
+            def getGlobal(env):
+                if lexeme in values:
+                    return values[lexeme]
+                raise(LoxRuntimeException(name, f"Undefined variable '{lexeme}'."))
+            return getGlobal
+
+        distance, slot = expr.depth, expr.slot
+        if distance == 0:
+            return lambda env: env.values[slot]
+        if distance == 1:
+            return lambda env: env.enclosing.values[slot]
+        if distance == 2:
+            return lambda env: env.enclosing.enclosing.values[slot]
+        return lambda env: env.ancestor(distance).values[slot]
+
+    def compileAssign(self, x):
+        value = self.compile(x.value)
+        name = x.name
+        lexeme = name.lexeme
+
+        if x.depth is None:
+            values = self.globals.values
+            def assignGlobal(env):
+                result = value(env)
+                if lexeme not in values:
+                    raise(LoxRuntimeException(name, f"Undefined variable '{lexeme}'."))
+                values[lexeme] = result
+                return result
+            return assignGlobal
+
+        distance, slot = x.depth, x.slot
+        if distance == 0:
+            def assignLocal(env):
+                result = env.values[slot] = value(env)
+                return result
+            return assignLocal
+
+        def assignAt(env):
+            result = env.ancestor(distance).values[slot] = value(env)
+            return result
+        return assignAt
+
+    def compileBinary(self, x):
+        left = self.compile(x.left)
+        right = self.compile(x.right)
+        op = x.operator
+        tt = op.token_type
+        check = self.checkNumberOperands
+
+        if x.numeric:
+            # TypeInference proved both operands are numbers.
+            fn = NUMBER_OPERATORS.get(tt, operator.add)
+            return lambda env: fn(left(env), right(env))
+        elif tt in NUMBER_OPERATORS:
+            fn = NUMBER_OPERATORS[tt]
+            def numeric(env):
+                a = left(env)
+                b = right(env)
+                if a.__class__ is float and b.__class__ is float:
+                    return fn(a, b)
+                check(op, a, b)
+                return fn(a, b)
+            return numeric
+        elif tt == TT.PLUS:
+            def plus(env):
+                a = left(env)
+                b = right(env)
+                if type(a) == type(b) and type(a) is not str:
+                    return a + b
+                string = concatenate(a, b)
+                if string is None:
+                    raise(LoxRuntimeException(op, "Operands must be two numbers or two strings."))
+                return string
+            return plus
+        elif tt == TT.BANG_EQUAL:
+            def notEqual(env):
+                a = left(env)
+                b = right(env)
+                if a is None:
+                    return b is not None
+                return not a == b
+            return notEqual
+        elif tt == TT.EQUAL_EQUAL:
+            def equal(env):
+                a = left(env)
+                b = right(env)
+                if a is None:
+                    return b is None
+                return a == b
+            return equal
+
+        # Unreachable.
+        return lambda env: None
+
+    def compileCall(self, x):
+        if isinstance(x.callee, GetExpr):
+            return self.compileInvoke(x)
+        if isinstance(x.callee, SuperExpr):
+            return self.compileSuperInvoke(x)
+
+        callee = self.compile(x.callee)
+        arguments = tuple(self.compile(argument) for argument in x.arguments)
+        paren = x.paren
+
+        def call(env):
+            function = callee(env)
+            args = [argument(env) for argument in arguments]
+            if not isinstance(function, LoxCallable):
+                raise(LoxRuntimeException(paren, "Can only call functions and classes."))
+            if len(args) != function.arity():
+                raise(LoxRuntimeException(paren, f"Expected {function.arity()} arguments but got {len(args)}."))
+            try:
+                return function.call(self, args)
+            except NativeError as e:
+                raise(LoxRuntimeException(paren, str(e)))
+        return call
+
+    def compileInvoke(self, x):
+        # obj.method(args) calls the method with obj as "this" directly
+        # rather than creating a bound method first.
+        obj = self.compile(x.callee.obj)
+        name = x.callee.name
+        lexeme = name.lexeme
+        arguments = tuple(self.compile(argument) for argument in x.arguments)
+        paren = x.paren
+        lookup = siteCache(x.callee, "get", name).lookupProperty
+
+        def invoke(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise(LoxRuntimeException(name, "Only instances have properties."))
+            index, method = lookup(instance.shape)
+            if index is not None:
+                function = instance.values[index]
+                receiver = None
+            else:
+                function = method
+                if not function:
+                    raise(LoxRuntimeException(name, f"Undefined property '{lexeme}'"))
+                receiver = instance
+            args = [argument(env) for argument in arguments]
+            if not isinstance(function, LoxCallable):
+                raise(LoxRuntimeException(paren, "Can only call functions and classes."))
+            if len(args) != function.arity():
+                raise(LoxRuntimeException(paren, f"Expected {function.arity()} arguments but got {len(args)}."))
+            try:
+                if receiver is not None:
+                    return function.callMethod(self, receiver, args)
+                return function.call(self, args)
+            except NativeError as e:
+                raise(LoxRuntimeException(paren, str(e)))
+        return invoke
+
+    def compileSuperInvoke(self, x):
+        distance, slot = x.callee.depth, x.callee.slot
+        method = x.callee.method
+        arguments = tuple(self.compile(argument) for argument in x.arguments)
+        paren = x.paren
+        lookup = siteCache(x.callee, "super", method).lookup
+
+        def superInvoke(env):
+            superclass = env.getAt(distance, slot)
+            obj = env.getAt(distance-1, 0)
+            function = lookup(superclass)
+            if not function:
+                raise(LoxRuntimeException(method, f"Undefined property '{method.lexeme}'."))
+            args = [argument(env) for argument in arguments]
+            if len(args) != function.arity():
+                raise(LoxRuntimeException(paren, f"Expected {function.arity()} arguments but got {len(args)}."))
+            try:
+                return function.callMethod(self, obj, args)
+            except NativeError as e:
+                raise(LoxRuntimeException(paren, str(e)))
+        return superInvoke
+
+    def compileGet(self, x):
+        obj = self.compile(x.obj)
+        name = x.name
+        lookup = siteCache(x, "get", name).lookupProperty
+
+        def get(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise(LoxRuntimeException(name, "Only instances have properties."))
+            index, method = lookup(instance.shape)
+            if index is not None:
+                return instance.values[index]
+            if method:
+                return method.bind(instance)
+            raise(LoxRuntimeException(name, f"Undefined property '{name.lexeme}'"))
+        return get
+
+    def compileGrouping(self, x):
+        return self.compile(x.expression)
+
+    def compileLiteral(self, x):
+        value = x.value
+        return lambda env: value
+
+    def compileLogical(self, x):
+        left = self.compile(x.left)
+        right = self.compile(x.right)
+
+        if x.operator.token_type == TT.OR:
+            def logicalOr(env):
+                value = left(env)
+                if value is None or value is False:
+                    return right(env)
+                return value
+            return logicalOr
+
+        def logicalAnd(env):
+            value = left(env)
+            if value is None or value is False:
+                return value
+            return right(env)
+        return logicalAnd
+
+    def compileSet(self, x):
+        obj = self.compile(x.obj)
+        value = self.compile(x.value)
+        name = x.name
+        lookup = siteCache(x, "set", name).lookupStore
+
+        def set(env):
+            instance = obj(env)
+            if not isinstance(instance, LoxInstance):
+                raise(LoxRuntimeException(name, "Only instances have fields."))
+            result = value(env)
+            index, shape = lookup(instance.shape)
+            if shape is instance.shape:
+                instance.values[index] = result
+            else:
+                instance.store(index, shape, result)
+            return result
+        return set
+
+    def compileSuper(self, x):
+        distance, slot = x.depth, x.slot
+        method = x.method
+        lookup = siteCache(x, "super", method).lookup
+
+        def superMethod(env):
+            superclass = env.getAt(distance, slot)
+
+            # "this" is always one level nearer than "super"'s environment,
+            # and is the only value in it.
+            obj = env.getAt(distance-1, 0)
+
+            function = lookup(superclass)
+            if not function:
+                raise(LoxRuntimeException(method, f"Undefined property '{method.lexeme}'."))
+            return function.bind(obj)
+        return superMethod
+
+    def compileThis(self, x):
+        return self.compileLookUp(x.keyword, x)
+
+    def compileUnary(self, x):
+        right = self.compile(x.right)
+        op = x.operator
+        tt = op.token_type
+        check = self.checkNumberOperand
+
+        if tt == TT.BANG:
+            def bang(env):
+                value = right(env)
+                return value is None or value is False
+            return bang
+        elif x.numeric:
+            return lambda env: -right(env)
+        elif tt == TT.MINUS:
+            def negate(env):
+                value = right(env)
+                check(op, value)
+                return -value
+            return negate
+
+        # Unreachable.
+        return lambda env: None
+
+    def compileVariable(self, x):
+        return self.compileLookUp(x.name, x)
+
+    def compileBlock(self, x):
+        body = self.compileStatements(x.statements)
+        return lambda env: body(Environment(env))
+
+    def compileClass(self, x):
+        superclassExpr = self.compile(x.superclass) if x.superclass else None
+        methods = [(method, self.compileStatements(method.body)) for method in x.methods]
+        name = x.name
+
+        def declareClass(env):
+            superclass = None
+            if superclassExpr:
+                superclass = superclassExpr(env)
+                if not isinstance(superclass, LoxClass):
+                    raise(LoxRuntimeException(x.superclass.name, "Superclass must be a class."))
+
+            enclosing = env
+            if superclassExpr:
+                env = Environment(env)
+                env.define("super", superclass)
+
+            functions = {}
+            for method, body in methods:
+                isInitializer = method.name.lexeme == "init"
+                functions[method.name.lexeme] = ClosureFunction(method, env, isInitializer, body)
+
+            klass = LoxClass(name.lexeme, superclass, functions)
+            enclosing.define(name.lexeme, klass)
+        return declareClass
+
+    def compileExpression(self, x):
+        expression = self.compile(x.expression)
+
+        def expressionStatement(env):
+            expression(env)
+        return expressionStatement
+
+    def compileFunction(self, x):
+        body = self.compileStatements(x.body)
+        lexeme = x.name.lexeme
+
+        def declareFunction(env):
+            if self.profiler is not None:
+                self.profiler.allocate()
+            env.define(lexeme, ClosureFunction(x, env, False, body))
+        return declareFunction
+
+    def compileIf(self, x):
+        condition = self.compile(x.condition)
+        thenBranch = self.compile(x.thenBranch)
+        elseBranch = self.compile(x.elseBranch) if x.elseBranch else None
+
+        if elseBranch:
+            def ifElse(env):
+                value = condition(env)
+                if value is None or value is False:
+                    return elseBranch(env)
+                return thenBranch(env)
+            return ifElse
+
+        def ifThen(env):
+            value = condition(env)
+            if not (value is None or value is False):
+                return thenBranch(env)
+        return ifThen
+
+    def compilePrint(self, x):
+        expression = self.compile(x.expression)
+        stringify = self.stringify
+
+        def printStatement(env):
+            print(stringify(expression(env)))
+        return printStatement
+
+    def compileReturn(self, x):
+        value = self.compile(x.value) if x.value else None
+
+        def returnStatement(env):
+            return LoxReturn(value(env) if value else None)
+        return returnStatement
+
+    def compileVarDeclaration(self, x):
+        initializer = self.compile(x.initializer) if x.initializer else None
+        lexeme = x.name.lexeme
+
+        def declareVariable(env):
+            env.define(lexeme, initializer(env) if initializer else None)
+        return declareVariable
+
+    def compileWhile(self, x):
+        condition = self.compile(x.condition)
+        body = self.compile(x.body)
+
+        def whileStatement(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return None
+                completion = body(env)
+                if completion is not None:
+                    return completion
+        return whileStatement
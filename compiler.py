@@ -0,0 +1,388 @@
+#!/usr/local/bin/python3
+
+from token import Token
+from visitor import Visitor
+from expr import *
+from stmt import *
+from chunk import OpCode as OP
+from vm_function import VMFunction
+from lox_types import TokenType as TT, FunctionType as FT
+
+BINARY_OPCODES = {
+    TT.BANG_EQUAL: OP.NOT_EQUAL,
+    TT.EQUAL_EQUAL: OP.EQUAL,
+    TT.GREATER: OP.GREATER,
+    TT.GREATER_EQUAL: OP.GREATER_EQUAL,
+    TT.LESS: OP.LESS,
+    TT.LESS_EQUAL: OP.LESS_EQUAL,
+    TT.MINUS: OP.SUBTRACT,
+    TT.PLUS: OP.ADD,
+    TT.SLASH: OP.DIVIDE,
+    TT.STAR: OP.MULTIPLY,
+}
+
+class Local:
+    def __init__(self, name, depth):
+        self.name = name
+        self.depth = depth
+        self.isCaptured = False
+
+class FunctionState:
+    def __init__(self, enclosing, function, function_type):
+        self.enclosing = enclosing
+        self.function = function
+        self.function_type = function_type
+        self.upvalues = []
+        self.scopeDepth = 0
+
+        # Slot zero holds the receiver in methods and the callee otherwise.
+        if function_type in [FT.METHOD, FT.INITIALIZER]:
+            self.locals = [Local("this", 0)]
+        else:
+            self.locals = [Local("", 0)]
+
+class ClassState:
+    def __init__(self, enclosing):
+        self.enclosing = enclosing
+        self.hasSuperclass = False
+
+class Compiler(Visitor):
+    """Compiles a resolved AST into bytecode for the VM.
+
+    The Resolver has already reported every static error, so the compiler
+    only tracks what it needs to lay out the stack: local slots, upvalues
+    and jump targets.
+    """
+
+    def __init__(self):
+        self.current = None
+        self.currentClass = None
+        self.line = 1
+
+    def compile(self, statements):
+        self.current = FunctionState(None, VMFunction(None), FT.NONE)
+        for statement in statements:
+            self.resolve(statement)
+        self.emitReturn()
+        return self.current.function
+
+    def resolve(self, x):
+        if isinstance(x, list):
+            for statement in x:
+                self.resolve(statement)
+        else:
+            x.accept(self)
+
+    # Emission helpers.
+
+    def chunk(self):
+        return self.current.function.chunk
+
+    def emit(self, *values):
+        for value in values:
+            self.chunk().write(int(value), self.line)
+
+    def emitConstant(self, value):
+        self.emit(OP.CONSTANT, self.chunk().addConstant(value))
+
+    def emitJump(self, op):
+        self.emit(op, 0)
+        return len(self.chunk().code) - 1
+
+    def patchJump(self, offset):
+        self.chunk().code[offset] = len(self.chunk().code) - offset - 1
+
+    def emitLoop(self, loopStart):
+        self.emit(OP.LOOP)
+        self.emit(len(self.chunk().code) - loopStart + 1)
+
+    def emitReturn(self):
+        if self.current.function_type == FT.INITIALIZER:
+            self.emit(OP.GET_LOCAL, 0)
+        else:
+            self.emit(OP.NIL)
+        self.emit(OP.RETURN)
+
+    def identifierConstant(self, name):
+        return self.chunk().addConstant(name.lexeme)
+
+    # Scopes and variables.
+
+    def beginScope(self):
+        self.current.scopeDepth += 1
+
+    def endScope(self):
+        state = self.current
+        state.scopeDepth -= 1
+        while state.locals and state.locals[-1].depth > state.scopeDepth:
+            if state.locals[-1].isCaptured:
+                self.emit(OP.CLOSE_UPVALUE)
+            else:
+                self.emit(OP.POP)
+            state.locals.pop()
+
+    def addLocal(self, name):
+        # A depth of None marks the local as declared but not yet defined.
+        self.current.locals.append(Local(name, None))
+
+    def declareVariable(self, name):
+        if self.current.scopeDepth == 0:
+            return
+        self.addLocal(name.lexeme)
+
+    def markInitialized(self):
+        if self.current.scopeDepth == 0:
+            return
+        self.current.locals[-1].depth = self.current.scopeDepth
+
+    def defineVariable(self, name):
+        if self.current.scopeDepth > 0:
+            self.markInitialized()
+            return
+        self.emit(OP.DEFINE_GLOBAL, self.identifierConstant(name))
+
+    def resolveLocal(self, state, lexeme):
+        for i in range(len(state.locals)-1, -1, -1):
+            if state.locals[i].name == lexeme:
+                return i
+        return None
+
+    def addUpvalue(self, state, index, isLocal):
+        upvalue = (isLocal, index)
+        if upvalue in state.upvalues:
+            return state.upvalues.index(upvalue)
+        state.upvalues.append(upvalue)
+        state.function.upvalueCount = len(state.upvalues)
+        return len(state.upvalues) - 1
+
+    def resolveUpvalue(self, state, lexeme):
+        if state.enclosing is None:
+            return None
+
+        local = self.resolveLocal(state.enclosing, lexeme)
+        if local is not None:
+            state.enclosing.locals[local].isCaptured = True
+            return self.addUpvalue(state, local, True)
+
+        upvalue = self.resolveUpvalue(state.enclosing, lexeme)
+        if upvalue is not None:
+            return self.addUpvalue(state, upvalue, False)
+
+        return None
+
+    def namedVariable(self, name, assign=None):
+        lexeme = name.lexeme
+        self.line = name.line
+
+        slot = self.resolveLocal(self.current, lexeme)
+        if slot is not None:
+            getOp, setOp = OP.GET_LOCAL, OP.SET_LOCAL
+        else:
+            slot = self.resolveUpvalue(self.current, lexeme)
+            if slot is not None:
+                getOp, setOp = OP.GET_UPVALUE, OP.SET_UPVALUE
+            else:
+                slot = self.identifierConstant(name)
+                getOp, setOp = OP.GET_GLOBAL, OP.SET_GLOBAL
+
+        if assign:
+            self.resolve(assign)
+            self.line = name.line
+            self.emit(setOp, slot)
+        else:
+            self.emit(getOp, slot)
+
+    def function(self, declaration, function_type):
+        self.current = FunctionState(self.current, VMFunction(declaration.name.lexeme), function_type)
+        self.beginScope()
+
+        for param in declaration.params:
+            self.current.function.arity += 1
+            self.addLocal(param.lexeme)
+            self.markInitialized()
+
+        self.resolve(declaration.body)
+        self.emitReturn()
+
+        state = self.current
+        self.current = state.enclosing
+
+        self.line = declaration.name.line
+        self.emit(OP.CLOSURE, self.chunk().addConstant(state.function))
+        for isLocal, index in state.upvalues:
+            self.emit(1 if isLocal else 0, index)
+
+    def call(self, x, tail=False):
+        if isinstance(x.callee, GetExpr):
+            # Invoke the method directly without creating a bound method.
+            # Like the interpreters, check the receiver and look up the
+            # method before evaluating the arguments.
+            self.resolve(x.callee.obj)
+            self.line = x.callee.name.line
+            self.emit(OP.GET_METHOD, self.identifierConstant(x.callee.name))
+            self.resolve(x.arguments)
+            self.line = x.paren.line
+            self.emit(OP.TAIL_INVOKE if tail else OP.INVOKE, len(x.arguments))
+        elif isinstance(x.callee, SuperExpr):
+            self.namedVariable(Token(TT.THIS, "this", None, x.callee.keyword.line))
+            self.namedVariable(x.callee.keyword)
+            self.line = x.callee.method.line
+            self.emit(OP.GET_SUPER_METHOD, self.identifierConstant(x.callee.method))
+            self.resolve(x.arguments)
+            self.line = x.paren.line
+            self.emit(OP.TAIL_INVOKE if tail else OP.INVOKE, len(x.arguments))
+        else:
+            self.resolve(x.callee)
+            self.resolve(x.arguments)
+            self.line = x.paren.line
+            self.emit(OP.TAIL_CALL if tail else OP.CALL, len(x.arguments))
+
+    def visit(self, x):
+        if isinstance(x, BlockStmt):
+            self.beginScope()
+            self.resolve(x.statements)
+            self.endScope()
+        elif isinstance(x, ClassStmt):
+            self.line = x.name.line
+            nameConstant = self.identifierConstant(x.name)
+            self.declareVariable(x.name)
+            self.emit(OP.CLASS, nameConstant)
+            self.defineVariable(x.name)
+
+            self.currentClass = ClassState(self.currentClass)
+
+            if x.superclass:
+                self.namedVariable(x.superclass.name)
+                self.beginScope()
+                self.addLocal("super")
+                self.markInitialized()
+
+                self.namedVariable(x.name)
+                self.line = x.superclass.name.line
+                self.emit(OP.INHERIT)
+                self.currentClass.hasSuperclass = True
+
+            self.namedVariable(x.name)
+            for method in x.methods:
+                function_type = FT.METHOD
+                if method.name.lexeme == "init":
+                    function_type = FT.INITIALIZER
+                self.function(method, function_type)
+                self.emit(OP.METHOD, self.identifierConstant(method.name))
+            self.emit(OP.POP)
+
+            if self.currentClass.hasSuperclass:
+                self.endScope()
+
+            self.currentClass = self.currentClass.enclosing
+        elif isinstance(x, ExpressionStmt):
+            self.resolve(x.expression)
+            self.emit(OP.POP)
+        elif isinstance(x, FunctionStmt):
+            self.declareVariable(x.name)
+            # Functions may refer to themselves, so define before compiling.
+            self.markInitialized()
+            self.function(x, FT.FUNCTION)
+            self.defineVariable(x.name)
+        elif isinstance(x, IfStmt):
+            self.resolve(x.condition)
+            thenJump = self.emitJump(OP.JUMP_IF_FALSE)
+            self.emit(OP.POP)
+            self.resolve(x.thenBranch)
+            elseJump = self.emitJump(OP.JUMP)
+            self.patchJump(thenJump)
+            self.emit(OP.POP)
+            if x.elseBranch:
+                self.resolve(x.elseBranch)
+            self.patchJump(elseJump)
+        elif isinstance(x, PrintStmt):
+            self.resolve(x.expression)
+            self.emit(OP.PRINT)
+        elif isinstance(x, ReturnStmt):
+            self.line = x.keyword.line
+            if isinstance(x.value, CallExpr) and self.current.function_type != FT.INITIALIZER:
+                # The callee replaces this frame; RETURN still runs if the
+                # callee turns out to be native and returns in place.
+                self.call(x.value, True)
+                self.emit(OP.RETURN)
+            elif x.value:
+                self.resolve(x.value)
+                self.emit(OP.RETURN)
+            else:
+                self.emitReturn()
+        elif isinstance(x, VariableStmt):
+            self.declareVariable(x.name)
+            if x.initializer:
+                self.resolve(x.initializer)
+            else:
+                self.emit(OP.NIL)
+            self.defineVariable(x.name)
+        elif isinstance(x, WhileStmt):
+            loopStart = len(self.chunk().code)
+            self.resolve(x.condition)
+            exitJump = self.emitJump(OP.JUMP_IF_FALSE)
+            self.emit(OP.POP)
+            self.resolve(x.body)
+            self.emitLoop(loopStart)
+            self.patchJump(exitJump)
+            self.emit(OP.POP)
+        elif isinstance(x, AssignExpr):
+            self.namedVariable(x.name, x.value)
+        elif isinstance(x, BinaryExpr):
+            self.resolve(x.left)
+            self.resolve(x.right)
+            self.line = x.operator.line
+            self.emit(BINARY_OPCODES[x.operator.token_type])
+        elif isinstance(x, CallExpr):
+            self.call(x)
+        elif isinstance(x, GetExpr):
+            self.resolve(x.obj)
+            self.line = x.name.line
+            self.emit(OP.GET_PROPERTY, self.identifierConstant(x.name))
+        elif isinstance(x, GroupingExpr):
+            self.resolve(x.expression)
+        elif isinstance(x, LiteralExpr):
+            if x.value is None:
+                self.emit(OP.NIL)
+            elif x.value is True:
+                self.emit(OP.TRUE)
+            elif x.value is False:
+                self.emit(OP.FALSE)
+            else:
+                self.emitConstant(x.value)
+        elif isinstance(x, LogicalExpr):
+            self.resolve(x.left)
+            if x.operator.token_type == TT.OR:
+                elseJump = self.emitJump(OP.JUMP_IF_FALSE)
+                endJump = self.emitJump(OP.JUMP)
+                self.patchJump(elseJump)
+                self.emit(OP.POP)
+                self.resolve(x.right)
+                self.patchJump(endJump)
+            else:
+                endJump = self.emitJump(OP.JUMP_IF_FALSE)
+                self.emit(OP.POP)
+                self.resolve(x.right)
+                self.patchJump(endJump)
+        elif isinstance(x, SetExpr):
+            self.resolve(x.obj)
+            self.resolve(x.value)
+            self.line = x.name.line
+            self.emit(OP.SET_PROPERTY, self.identifierConstant(x.name))
+        elif isinstance(x, SuperExpr):
+            self.namedVariable(Token(TT.THIS, "this", None, x.keyword.line))
+            self.namedVariable(x.keyword)
+            self.line = x.method.line
+            self.emit(OP.GET_SUPER, self.identifierConstant(x.method))
+        elif isinstance(x, ThisExpr):
+            self.namedVariable(x.keyword)
+        elif isinstance(x, UnaryExpr):
+            self.resolve(x.right)
+            self.line = x.operator.line
+            if x.operator.token_type == TT.BANG:
+                self.emit(OP.NOT)
+            else:
+                self.emit(OP.NEGATE)
+        elif isinstance(x, VariableExpr):
+            self.namedVariable(x.name)
+        return None
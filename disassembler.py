@@ -0,0 +1,59 @@
+#!/usr/local/bin/python3
+
+from chunk import OpCode as OP, OPERAND_COUNTS
+from vm_function import VMFunction
+
+JUMP_OPCODES = [OP.JUMP, OP.JUMP_IF_FALSE]
+
+def disassemble(function):
+    """Returns a listing of function and every function nested inside it."""
+    lines = []
+    pending = [function]
+    while pending:
+        function = pending.pop(0)
+        lines.append(f"== {function} ==")
+        lines.extend(disassembleChunk(function.chunk))
+        pending.extend(c for c in function.chunk.constants if isinstance(c, VMFunction))
+    return "\n".join(lines)
+
+def disassembleChunk(chunk):
+    lines = []
+    offset = 0
+    while offset < len(chunk.code):
+        text, offset = disassembleInstruction(chunk, offset)
+        lines.append(text)
+    return lines
+
+def disassembleInstruction(chunk, offset):
+    op = OP(chunk.code[offset])
+    line = chunk.lines[offset]
+    if offset > 0 and line == chunk.lines[offset-1]:
+        prefix = f"{offset:04d}    | "
+    else:
+        prefix = f"{offset:04d} {line:4d} "
+
+    operands = chunk.code[offset+1:offset+1+OPERAND_COUNTS[op]]
+    nextOffset = offset + 1 + len(operands)
+    text = f"{prefix}{op.name:<16}"
+
+    if op in [OP.CONSTANT, OP.GET_GLOBAL, OP.DEFINE_GLOBAL, OP.SET_GLOBAL,
+              OP.GET_PROPERTY, OP.SET_PROPERTY, OP.GET_SUPER, OP.GET_METHOD,
+              OP.GET_SUPER_METHOD, OP.CLASS, OP.METHOD]:
+        text += f"{operands[0]:4d} '{chunk.constants[operands[0]]}'"
+    elif op in JUMP_OPCODES:
+        text += f"{operands[0]:4d} -> {nextOffset + operands[0]}"
+    elif op == OP.LOOP:
+        text += f"{operands[0]:4d} -> {nextOffset - operands[0]}"
+    elif op == OP.CLOSURE:
+        function = chunk.constants[operands[0]]
+        text += f"{operands[0]:4d} {function}"
+        for i in range(function.upvalueCount):
+            isLocal = chunk.code[nextOffset]
+            index = chunk.code[nextOffset+1]
+            kind = "local" if isLocal else "upvalue"
+            text += f"\n{nextOffset:04d}    |   {kind} {index}"
+            nextOffset += 2
+    elif operands:
+        text += f"{operands[0]:4d}"
+
+    return text, nextOffset
@@ -3,12 +3,19 @@
 from error_handler import LoxRuntimeException
 
 class Environment:
-    def __init__(self, enclosing=None):
+    """A local scope. The Resolver assigns every local a slot index in
+    declaration order, so values are stored in a list and accessed by
+    (distance, slot) instead of by name.
+    """
+
+    __slots__ = ("enclosing", "values")
+
+    def __init__(self, enclosing=None, values=None):
         self.enclosing = enclosing
-        self.values = {}
+        self.values = [] if values is None else values
 
     def define(self, name, value):
-        self.values[name] = value
+        self.values.append(value)
 
     def ancestor(self, distance):
         environment = self
@@ -16,24 +23,32 @@ class Environment:
             environment = environment.enclosing
         return environment
 
-    def getAt(self, distance, name):
-        return self.ancestor(distance).values[name]
+    def getAt(self, distance, slot):
+        return self.ancestor(distance).values[slot]
+
+    def assignAt(self, distance, slot, value):
+        self.ancestor(distance).values[slot] = value
+
+class GlobalEnvironment:
+    """The outermost scope. Globals are late bound, so they stay keyed by
+    name and are never resolved to slots.
+    """
 
-    def assignAt(self, distance, name, value):
-        self.ancestor(distance).values[name.lexeme] = value
+    __slots__ = ("values",)
+
+    def __init__(self):
+        self.values = {}
+
+    def define(self, name, value):
+        self.values[name] = value
 
     def get(self, name):
         if name.lexeme in self.values:
             return self.values[name.lexeme]
-        if self.enclosing:
-            return self.enclosing.get(name)
         raise(LoxRuntimeException(name, f"Undefined variable '{name.lexeme}'."))
 
     def assign(self, name, value):
         if name.lexeme in self.values:
             self.values[name.lexeme] = value
             return
-        if self.enclosing:
-            self.enclosing.assign(name, value)
-            return
         raise(LoxRuntimeException(name, f"Undefined variable '{name.lexeme}'."))
@@ -15,7 +15,7 @@ class ErrorHandler:
             else:
                 self.report(x.line, f" at '{x.lexeme}'", message)
         else:
-            self.report(line, "", message)
+            self.report(x, "", message)
 
     def runtimeError(self, error):
         print(error)
@@ -1,25 +1,46 @@
 #!/usr/local/bin/python3
 
 class Expr:
+    __slots__ = ()
+
+    # Set on the quickened node classes, whose evaluate the Interpreter
+    # calls instead of visit; see quicken.py.
+    quickened = False
+
     def accept(self, visitor):
         return visitor.visit(self)
 
+    def evaluate(self, interpreter):
+        return interpreter.visit(self)
+
+# Variable-like expressions carry their resolution: the Resolver fills in
+# depth and slot for locals and leaves depth as None for globals. Property
+# accesses carry the inline cache the interpreter attaches on first use.
+# Arithmetic and comparisons carry numeric, set by TypeInference when their
+# operands are proven numbers and need no runtime check.
+
 class AssignExpr(Expr):
+    __slots__ = ("name", "value", "depth", "slot")
     def __init__(self, name, value):
         self.name = name
         self.value = value
+        self.depth = None
+        self.slot = None
     def __str__(self):
         return f"{self.name} {self.value}"
 
 class BinaryExpr(Expr):
+    __slots__ = ("left", "operator", "right", "numeric")
     def __init__(self, left, operator, right):
         self.left = left
         self.operator = operator
         self.right = right
+        self.numeric = False
     def __str__(self):
         return f"{self.left} {self.operator} {self.right}"
 
 class CallExpr(Expr):
+    __slots__ = ("callee", "paren", "arguments")
     def __init__(self, callee, paren, arguments):
         self.callee = callee
         self.paren = paren
@@ -28,23 +49,28 @@ class CallExpr(Expr):
         return f"{self.callee} {self.paren} {self.arguments}"
 
 class GetExpr(Expr):
+    __slots__ = ("obj", "name", "cache")
     def __init__(self, obj, name):
         self.obj = obj
         self.name = name
+        self.cache = None
 
 class GroupingExpr(Expr):
+    __slots__ = ("expression",)
     def __init__(self, expression):
         self.expression = expression
     def __str__(self):
         return f"{self.expression}"
 
 class LiteralExpr(Expr):
+    __slots__ = ("value",)
     def __init__(self, value):
         self.value = value
     def __str__(self):
         return f"{self.value}"
 
 class LogicalExpr(Expr):
+    __slots__ = ("left", "operator", "right")
     def __init__(self, left, operator, right):
         self.left = left
         self.operator = operator
@@ -53,29 +79,43 @@ class LogicalExpr(Expr):
         return f"{self.left} {self.operator} {self.right}"
 
 class SetExpr(Expr):
+    __slots__ = ("obj", "name", "value", "cache")
     def __init__(self, obj, name, value):
         self.obj = obj
         self.name = name
         self.value = value
+        self.cache = None
 
 class SuperExpr(Expr):
+    __slots__ = ("keyword", "method", "depth", "slot", "cache")
     def __init__(self, keyword, method):
         self.keyword = keyword
         self.method = method
+        self.depth = None
+        self.slot = None
+        self.cache = None
 
 class ThisExpr(Expr):
+    __slots__ = ("keyword", "depth", "slot")
     def __init__(self, keyword):
         self.keyword = keyword
+        self.depth = None
+        self.slot = None
 
 class UnaryExpr(Expr):
+    __slots__ = ("operator", "right", "numeric")
     def __init__(self, operator, right):
         self.operator = operator
         self.right = right
+        self.numeric = False
     def __str__(self):
         return f"{self.operator} {self.right}"
 
 class VariableExpr(Expr):
+    __slots__ = ("name", "depth", "slot")
     def __init__(self, name):
         self.name = name
+        self.depth = None
+        self.slot = None
     def __str__(self):
         return f"{name}"
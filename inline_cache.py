@@ -0,0 +1,96 @@
+#!/usr/local/bin/python3
+
+import weakref
+
+# Past this many receiver classes a site is megamorphic and stops caching.
+MAX_ENTRIES = 4
+
+# Every live cache, so hit/miss counts can be reported. Caches hang off AST
+# nodes and disappear together with the program they belong to.
+sites = weakref.WeakSet()
+
+class InlineCache:
+    """Remembers what a property name resolves to at one GetExpr, SetExpr or
+    SuperExpr site.
+
+    Get and set sites are keyed by the receiver's shape, which fixes both
+    its class and its field layout. A get entry holds the field's index, or
+    None and the class's method for the name; a set entry holds the index to
+    store to and the shape after the store. Super sites are keyed by class
+    and hold the method. Entries that depend on methods are tagged with the
+    class version and ignored once the class's methods change.
+    """
+
+    def __init__(self, kind, name):
+        self.kind = kind
+        self.name = name
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.megamorphic = False
+        sites.add(self)
+
+    def lookup(self, klass):
+        entry = self.entries.get(klass)
+        if entry is not None and entry[0] == klass.version:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        method = klass.findMethod(self.name.lexeme)
+        self.record(klass, (klass.version, method))
+        return method
+
+    def lookupProperty(self, shape):
+        entry = self.entries.get(shape)
+        if entry is not None and entry[0] == shape.klass.version:
+            self.hits += 1
+            return entry[1]
+
+        self.misses += 1
+        index = shape.indexes.get(self.name.lexeme)
+        method = None
+        if index is None:
+            method = shape.klass.findMethod(self.name.lexeme)
+        result = (index, method)
+        self.record(shape, (shape.klass.version, result))
+        return result
+
+    def lookupStore(self, shape):
+        entry = self.entries.get(shape)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = shape.store(self.name.lexeme)
+        self.record(shape, entry)
+        return entry
+
+    def record(self, key, entry):
+        if key in self.entries or len(self.entries) < MAX_ENTRIES:
+            self.entries[key] = entry
+        else:
+            self.megamorphic = True
+
+    def state(self):
+        if self.megamorphic:
+            return "megamorphic"
+        if len(self.entries) == 0:
+            return "uninitialized"
+        if len(self.entries) == 1:
+            return "monomorphic"
+        return "polymorphic"
+
+def siteCache(node, kind, name):
+    if node.cache is None:
+        node.cache = InlineCache(kind, name)
+    return node.cache
+
+def report():
+    lines = [f"{'line':>6} {'site':<24} {'state':<14} {'entries':>7} {'hits':>10} {'misses':>8}"]
+    for cache in sorted(sites, key=lambda c: -(c.hits + c.misses)):
+        site = f"{cache.kind} .{cache.name.lexeme}"
+        lines.append(f"{cache.name.line:>6} {site:<24} {cache.state():<14} "
+                     f"{len(cache.entries):>7} {cache.hits:>10} {cache.misses:>8}")
+    return "\n".join(lines)
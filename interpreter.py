@@ -4,85 +4,68 @@ from lox_types import TokenType as TT
 from visitor import Visitor
 from expr import *
 from stmt import *
-from environment import Environment
+from environment import Environment, GlobalEnvironment
 from lox_function import LoxFunction
 from lox_callable import LoxCallable
 from lox_return import LoxReturn
 from lox_class import LoxClass
 from lox_instance import LoxInstance
 from error_handler import LoxRuntimeException
+from inline_cache import siteCache
+from rope import concatenate
+from quicken import quicken
+from native import NativeFunction, NativeError, defineNatives
+from lox_builtins import BUILTINS
+from lox_collections import COLLECTIONS
 
 class Interpreter(Visitor):
     def __init__(self, error_handler):
         self.error_handler = error_handler
-        self.globals = Environment()
+        self.globals = GlobalEnvironment()
         self.environment = self.globals
-        self.locals = {}
+        # A Profiler while --profile is on; Lox calls report to it.
+        self.profiler = None
+        # RuntimeStats in the counting engines used by --stats.
+        self.stats = None
+        # A JIT while --jit is on; counts calls and loops and compiles hot
+        # functions.
+        self.jit = None
+        defineNatives(self.globals, BUILTINS)
+        for klass in COLLECTIONS:
+            self.globals.define(klass.name, klass)
+
+    def defineNative(self, name, arity, function):
+        """Makes the Python function callable from Lox as the global name."""
+        self.globals.define(name, NativeFunction(name, arity, function))
 
     def visit(self, x):
         if isinstance(x, AssignExpr):
             value = self.evaluate(x.value)
 
-            if x in self.locals:
-                distance = self.locals[x]
-                if distance is not None:
-                    self.environment.assignAt(distance, x.name, value)
-            else:
+            if x.depth is None:
                 self.globals.assign(x.name, value)
+            else:
+                self.environment.assignAt(x.depth, x.slot, value)
 
             return value
         elif isinstance(x, BinaryExpr):
             left = self.evaluate(x.left)
             right = self.evaluate(x.right)
-
-            tt = x.operator.token_type
-            if tt == TT.GREATER:
-                self.checkNumberOperands(x.operator, left, right)
-                return left > right
-            elif tt == TT.GREATER_EQUAL:
-                self.checkNumberOperands(x.operator, left, right)
-                return left >= right
-            elif tt == TT.LESS:
-                self.checkNumberOperands(x.operator, left, right)
-                return left < right
-            elif tt == TT.LESS_EQUAL:
-                self.checkNumberOperands(x.operator, left, right)
-                return left <= right
-            elif tt == TT.MINUS:
-                self.checkNumberOperands(x.operator, left, right)
-                return left - right
-            elif tt == TT.PLUS:
-                if type(left) == type(right):
-                    return left + right
-                raise(LoxRuntimeException(x.operator, "Operands must be two numbers or two strings."))
-            elif tt == TT.SLASH:
-                self.checkNumberOperands(x.operator, left, right)
-                return left // right
-            elif tt == TT.STAR:
-                self.checkNumberOperands(x.operator, left, right)
-                return left * right
-            elif tt == TT.BANG_EQUAL:
-                return not self.isEqual(left, right)
-            elif tt == TT.EQUAL_EQUAL:
-                return self.isEqual(left, right)
-
-            # Unreachable.
-            return None
+            value = self.binary(x, left, right)
+            if type(x) is BinaryExpr:
+                quicken(x, left, right)
+            return value
         elif isinstance(x, CallExpr):
-            callee = self.evaluate(x.callee)
-            arguments = []
-            for argument in x.arguments:
-                arguments.append(self.evaluate(argument))
-            if not isinstance(callee, LoxCallable):
-                raise(LoxRuntimeException(x.paren, "Can only call functions and classes."))
-            function = callee
-            if len(arguments) != function.arity():
-                raise(LoxRuntimeException(x.paren, f"Expected {function.arity()} arguments but got {len(arguments)}."))
-            return function.call(self, arguments)
+            if isinstance(x.callee, GetExpr):
+                return self.invoke(x)
+            if isinstance(x.callee, SuperExpr):
+                return self.invokeSuper(x)
+
+            return self.callValue(x, self.evaluate(x.callee))
         elif isinstance(x, GetExpr):
             obj = self.evaluate(x.obj)
             if isinstance(obj, LoxInstance):
-                return obj.get(x.name)
+                return obj.get(x.name, siteCache(x, "get", x.name))
             raise(LoxRuntimeException(x.name, "Only instances have properties."))
         elif isinstance(x, UnaryExpr):
             right = self.evaluate(x.right)
@@ -91,7 +74,8 @@ class Interpreter(Visitor):
             if tt == TT.BANG:
                 return not self.isTruthy(right)
             elif tt == TT.MINUS:
-                self.checkNumberOperand(x.operator, right)
+                if not x.numeric:
+                    self.checkNumberOperand(x.operator, right)
                 return -right
 
             # Unreachable.
@@ -102,7 +86,7 @@ class Interpreter(Visitor):
             return x.value
         elif isinstance(x, LogicalExpr):
             left = self.evaluate(x.left)
-            if x.operator.type == TT.OR:
+            if x.operator.token_type == TT.OR:
                 if self.isTruthy(left):
                     return left
             else:
@@ -114,16 +98,16 @@ class Interpreter(Visitor):
             if not isinstance(obj, LoxInstance):
                 raise(LoxRuntimeException(x.name, "Only instances have fields."))
             value = self.evaluate(x.value)
-            obj.set(x.name, value)
+            obj.set(x.name, value, siteCache(x, "set", x.name))
             return value
         elif isinstance(x, SuperExpr):
-            distance = self.locals[x]
-            superclass = self.environment.getAt(distance, "super")
+            superclass = self.environment.getAt(x.depth, x.slot)
 
-            # "this" is always one level nearer than "super"'s environment.
-            obj = self.environment.getAt(distance-1, "this")
+            # "this" is always one level nearer than "super"'s environment,
+            # and is the only value in it.
+            obj = self.environment.getAt(x.depth-1, 0)
 
-            method = superclass.findMethod(x.method.lexeme)
+            method = siteCache(x, "super", x.method).lookup(superclass)
             if not method:
                 raise(LoxRuntimeException(x.method, f"Undefined property '{x.method.lexeme}'."))
             return method.bind(obj)
@@ -135,8 +119,7 @@ class Interpreter(Visitor):
             self.evaluate(x.expression)
             return None
         elif isinstance(x, BlockStmt):
-            self.executeBlock(x.statements, Environment(self.environment))
-            return None
+            return self.executeBlock(x.statements, Environment(self.environment))
         elif isinstance(x, ClassStmt):
             superclass = None
             if x.superclass:
@@ -144,8 +127,6 @@ class Interpreter(Visitor):
                 if not isinstance(superclass, LoxClass):
                     raise(LoxRuntimeException(x.superclass.name, "Superclass must be a class."))
 
-            self.environment.define(x.name.lexeme, None)
-
             if x.superclass:
                 self.environment = Environment(self.environment)
                 self.environment.define("super", superclass)
@@ -160,17 +141,21 @@ class Interpreter(Visitor):
             if superclass:
                 self.environment = self.environment.enclosing
 
-            self.environment.assign(x.name, klass)
+            # Methods only look the class up when called, so it is safe to
+            # define the name once the class exists.
+            self.environment.define(x.name.lexeme, klass)
             return None
         elif isinstance(x, FunctionStmt):
             function = LoxFunction(x, self.environment)
+            if self.profiler is not None:
+                self.profiler.allocate()
             self.environment.define(x.name.lexeme, function)
             return None
         elif isinstance(x, IfStmt):
             if self.isTruthy(self.evaluate(x.condition)):
-                self.execute(x.thenBranch)
+                return self.execute(x.thenBranch)
             elif x.elseBranch:
-                self.execute(x.elseBranch)
+                return self.execute(x.elseBranch)
             return None
         elif isinstance(x, PrintStmt):
             value = self.evaluate(x.expression)
@@ -180,7 +165,7 @@ class Interpreter(Visitor):
             value = None
             if x.value:
                 value = self.evaluate(x.value)
-            raise(LoxReturn(value))
+            return LoxReturn(value)
         elif isinstance(x, VariableStmt):
             value = None
             if x.initializer:
@@ -188,17 +173,96 @@ class Interpreter(Visitor):
             self.environment.define(x.name.lexeme, value)
             return None
         elif isinstance(x, WhileStmt):
+            jit = self.jit
             while self.isTruthy(self.evaluate(x.condition)):
-                self.execute(x.body)
+                completion = self.execute(x.body)
+                if completion is not None:
+                    return completion
+                if jit is not None:
+                    jit.backEdge(x)
             return None
 
     def lookUpVariable(self, name, expr):
-        if expr in self.locals:
-            distance = self.locals[expr]
-            if distance is not None:
-                return self.environment.getAt(distance, name.lexeme)
-        else:
+        if expr.depth is None:
             return self.globals.get(name)
+        return self.environment.getAt(expr.depth, expr.slot)
+
+    def invoke(self, x):
+        # obj.method(args) calls the method with obj as "this" directly
+        # rather than creating a bound method first.
+        obj = self.evaluate(x.callee.obj)
+        name = x.callee.name
+        if not isinstance(obj, LoxInstance):
+            raise(LoxRuntimeException(name, "Only instances have properties."))
+        index, method = siteCache(x.callee, "get", name).lookupProperty(obj.shape)
+        if index is not None:
+            return self.callValue(x, obj.values[index])
+        if not method:
+            raise(LoxRuntimeException(name, f"Undefined property '{name.lexeme}'"))
+        return self.callValue(x, method, obj)
+
+    def invokeSuper(self, x):
+        callee = x.callee
+        superclass = self.environment.getAt(callee.depth, callee.slot)
+        obj = self.environment.getAt(callee.depth-1, 0)
+        method = siteCache(callee, "super", callee.method).lookup(superclass)
+        if not method:
+            raise(LoxRuntimeException(callee.method, f"Undefined property '{callee.method.lexeme}'."))
+        return self.callValue(x, method, obj)
+
+    def callValue(self, x, callee, receiver=None):
+        arguments = []
+        for argument in x.arguments:
+            arguments.append(self.evaluate(argument))
+        if not isinstance(callee, LoxCallable):
+            raise(LoxRuntimeException(x.paren, "Can only call functions and classes."))
+        if len(arguments) != callee.arity():
+            raise(LoxRuntimeException(x.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}."))
+        try:
+            if receiver is not None:
+                return callee.callMethod(self, receiver, arguments)
+            return callee.call(self, arguments)
+        except NativeError as e:
+            raise(LoxRuntimeException(x.paren, str(e)))
+
+    def binary(self, x, left, right):
+        # The generic path for a BinaryExpr with evaluated operands.
+        tt = x.operator.token_type
+        if tt == TT.GREATER:
+            self.checkNumberOperands(x.operator, left, right)
+            return left > right
+        elif tt == TT.GREATER_EQUAL:
+            self.checkNumberOperands(x.operator, left, right)
+            return left >= right
+        elif tt == TT.LESS:
+            self.checkNumberOperands(x.operator, left, right)
+            return left < right
+        elif tt == TT.LESS_EQUAL:
+            self.checkNumberOperands(x.operator, left, right)
+            return left <= right
+        elif tt == TT.MINUS:
+            self.checkNumberOperands(x.operator, left, right)
+            return left - right
+        elif tt == TT.PLUS:
+            if type(left) == type(right) and type(left) is not str:
+                return left + right
+            string = concatenate(left, right)
+            if string is None:
+                raise(LoxRuntimeException(x.operator, "Operands must be two numbers or two strings."))
+            return string
+        elif tt == TT.SLASH:
+            self.checkNumberOperands(x.operator, left, right)
+            return left // right
+        elif tt == TT.STAR:
+            self.checkNumberOperands(x.operator, left, right)
+            return left * right
+        elif tt == TT.BANG_EQUAL:
+            return not self.isEqual(left, right)
+        elif tt == TT.EQUAL_EQUAL:
+            return self.isEqual(left, right)
+
+        # Unreachable.
+        return None
 
     def interpret(self, statements):
         try:
@@ -239,19 +303,22 @@ class Interpreter(Visitor):
         return obj
 
     def evaluate(self, expr):
-        return expr.accept(self)
+        # Unquickened nodes go straight to visit, at no extra frame.
+        if expr.quickened:
+            return expr.evaluate(self)
+        return self.visit(expr)
 
     def execute(self, stmt):
         return stmt.accept(self)
 
-    def resolve(self, expr, depth):
-        self.locals[expr] = depth
-
     def executeBlock(self, statements, environment):
         previous = self.environment
         try:
             self.environment = environment
             for statement in statements:
-                self.execute(statement)
+                completion = self.execute(statement)
+                if completion is not None:
+                    return completion
+            return None
         finally:
             self.environment = previous
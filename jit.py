@@ -0,0 +1,450 @@
+#!/usr/local/bin/python3
+
+import math
+
+from expr import *
+from stmt import *
+from lox_types import TokenType as TT
+from lox_callable import LoxCallable
+from lox_instance import LoxInstance
+from error_handler import LoxRuntimeException
+from inline_cache import siteCache
+from native import NativeError
+from optimizer import children
+
+# Tiered compilation for the tree-walking interpreter (--jit).
+#
+# Every LoxFunction call and every loop iteration inside a function is
+# counted per declaration. Once a function is hot, the next call
+# translates its resolved body into the source of a Python function,
+# compiles that with compile() and stores it on the FunctionStmt, where
+# LoxFunction.execute picks it up in place of executeBlock.
+#
+# Locals become Python locals, variables of enclosing scopes are read
+# through the closure's Environment chain and globals through the global
+# dict. Operators test for numbers inline and hand anything else to
+# Interpreter.binary, so truthiness, nil and runtime errors (with the
+# line of their token) behave as in the interpreter. A function that
+# declares functions or classes, whose locals would have to be captured,
+# or uses super stays interpreted.
+
+HOT_CALLS = 100
+HOT_BACK_EDGES = 1000
+
+COMPARISONS = {TT.LESS: "<", TT.LESS_EQUAL: "<=", TT.GREATER: ">", TT.GREATER_EQUAL: ">="}
+ARITHMETIC = {TT.PLUS: "+", TT.MINUS: "-", TT.STAR: "*", TT.SLASH: "//"}
+
+class Untranslatable(Exception):
+    pass
+
+# Runtime support for compiled functions. Each raises the error the
+# interpreter would raise for the same node.
+
+def equal(a, b):
+    if a is None:
+        return b is None
+    return a == b
+
+def negate(interpreter, x, value):
+    interpreter.checkNumberOperand(x.operator, value)
+    return -value
+
+def undefinedVariable(x):
+    raise(LoxRuntimeException(x.name, f"Undefined variable '{x.name.lexeme}'."))
+
+def assignGlobal(values, x, value):
+    if x.name.lexeme not in values:
+        undefinedVariable(x)
+    values[x.name.lexeme] = value
+    return value
+
+def store(values, slot, value):
+    values[slot] = value
+    return value
+
+def call(interpreter, x, callee, arguments, receiver=None):
+    if not isinstance(callee, LoxCallable):
+        raise(LoxRuntimeException(x.paren, "Can only call functions and classes."))
+    if len(arguments) != callee.arity():
+        raise(LoxRuntimeException(x.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}."))
+    try:
+        if receiver is not None:
+            return callee.callMethod(interpreter, receiver, arguments)
+        return callee.call(interpreter, arguments)
+    except NativeError as e:
+        raise(LoxRuntimeException(x.paren, str(e)))
+
+def lookUpMethod(x, cache, obj):
+    """Returns the callee and receiver of obj.name(...), a field holding a
+    function having no receiver.
+    """
+    name = x.callee.name
+    if not isinstance(obj, LoxInstance):
+        raise(LoxRuntimeException(name, "Only instances have properties."))
+    index, method = cache.lookupProperty(obj.shape)
+    if index is not None:
+        return obj.values[index], None
+    if not method:
+        raise(LoxRuntimeException(name, f"Undefined property '{name.lexeme}'"))
+    return method, obj
+
+def invoke(interpreter, x, method, arguments):
+    return call(interpreter, x, method[0], arguments, method[1])
+
+def getProperty(x, cache, obj):
+    if isinstance(obj, LoxInstance):
+        return obj.get(x.name, cache)
+    raise(LoxRuntimeException(x.name, "Only instances have properties."))
+
+def fieldTarget(x, obj):
+    if isinstance(obj, LoxInstance):
+        return obj
+    raise(LoxRuntimeException(x.name, "Only instances have fields."))
+
+def setProperty(x, cache, obj, value):
+    obj.set(x.name, value, cache)
+    return value
+
+RUNTIME = {
+    "_equal": equal,
+    "_negate": negate,
+    "_undefinedVariable": undefinedVariable,
+    "_assignGlobal": assignGlobal,
+    "_store": store,
+    "_call": call,
+    "_lookUpMethod": lookUpMethod,
+    "_invoke": invoke,
+    "_getProperty": getProperty,
+    "_fieldTarget": fieldTarget,
+    "_setProperty": setProperty,
+}
+
+class Translator:
+    """Translates one function declaration into Python source.
+
+    Every operation is emitted as its own statement that stores its result
+    in a temporary, so the source nests no deeper than the Lox blocks do,
+    however long an expression is.
+
+    Generated names cannot collide: Lox locals are suffixed with _<n>,
+    temporaries are _t<n>, AST nodes and caches the code refers to are
+    _n<n>, and runtime helpers are the underscored names in RUNTIME.
+    """
+
+    def __init__(self, declaration, isMethod):
+        self.declaration = declaration
+        self.isMethod = isMethod
+        self.scopes = []
+        self.names = 0
+        self.temps = 0
+        self.namespace = dict(RUNTIME)
+        self.environments = set()
+        self.usesGlobals = False
+        # The lines being emitted and their indentation.
+        self.out = []
+        self.indent = 1
+
+    def compile(self):
+        source = self.translate()
+        name = self.declaration.name
+        try:
+            code = compile(source, f"<jit {name.lexeme}:{name.line}>", "exec")
+            exec(code, self.namespace)
+        except (SyntaxError, RecursionError, MemoryError) as e:
+            # Python's own limits, such as its nesting of loops.
+            raise(Untranslatable(f"Python cannot compile it ({e.__class__.__name__})"))
+        return self.namespace["function"]
+
+    def translate(self):
+        self.scopes.append([])
+        params = []
+        if self.isMethod:
+            params.append(self.declare("this"))
+        for param in self.declaration.params:
+            params.append(self.declare(param.lexeme))
+        self.statements(self.declaration.body)
+        self.scopes.pop()
+
+        lines = ["def function(interpreter, closure, values):"]
+        if params:
+            lines.append(f"    {', '.join(params)}, = values")
+        if self.usesGlobals:
+            lines.append("    _gv = interpreter.globals.values")
+        lines.append("    _binary = interpreter.binary")
+        environment = "closure"
+        for distance in range(max(self.environments, default=-1) + 1):
+            lines.append(f"    _e{distance} = {environment}")
+            environment = f"_e{distance}.enclosing"
+        lines += self.out
+        lines.append("    return None")
+        return "\n".join(lines) + "\n"
+
+    def declare(self, lexeme):
+        name = f"{lexeme}_{self.names}"
+        self.names += 1
+        self.scopes[-1].append(name)
+        return name
+
+    def temp(self):
+        self.temps += 1
+        return f"_t{self.temps}"
+
+    def constant(self, value):
+        name = f"_n{len(self.namespace)}"
+        self.namespace[name] = value
+        return name
+
+    def emit(self, line):
+        self.out.append("    " * self.indent + line)
+
+    def assign(self, value):
+        t = self.temp()
+        self.emit(f"{t} = {value}")
+        return t
+
+    def assignTo(self, name, x):
+        self.emit(f"{name} = {self.expression(x)}")
+
+    def nested(self, translate, *args):
+        """Emits what translate emits one level deeper, or pass if it
+        emits nothing.
+        """
+        self.indent += 1
+        start = len(self.out)
+        translate(*args)
+        if len(self.out) == start:
+            self.emit("pass")
+        self.indent -= 1
+
+    def statements(self, statements):
+        for statement in statements:
+            self.statement(statement)
+
+    def block(self, statement):
+        if isinstance(statement, BlockStmt):
+            self.scopes.append([])
+            self.statements(statement.statements)
+            self.scopes.pop()
+        else:
+            self.statement(statement)
+
+    def statement(self, x):
+        if isinstance(x, ExpressionStmt):
+            self.expression(x.expression)
+        elif isinstance(x, PrintStmt):
+            value = self.named(self.expression(x.expression))
+            self.emit(f"print('nil' if {value} is None else {value})")
+        elif isinstance(x, VariableStmt):
+            value = self.expression(x.initializer) if x.initializer else "None"
+            self.emit(f"{self.declare(x.name.lexeme)} = {value}")
+        elif isinstance(x, BlockStmt):
+            self.block(x)
+        elif isinstance(x, IfStmt):
+            self.emit(f"if {self.condition(x.condition)}:")
+            self.nested(self.block, x.thenBranch)
+            if x.elseBranch:
+                self.emit("else:")
+                self.nested(self.block, x.elseBranch)
+        elif isinstance(x, WhileStmt):
+            self.emit("while True:")
+            self.nested(self.loop, x)
+        elif isinstance(x, ReturnStmt):
+            value = self.expression(x.value) if x.value else "None"
+            self.emit(f"return {value}")
+        elif isinstance(x, FunctionStmt):
+            raise(Untranslatable("declares a function"))
+        else:
+            raise(Untranslatable("declares a class"))
+
+    def loop(self, x):
+        # The condition may take statements, so it is tested in the body.
+        self.emit(f"if not {self.condition(x.condition)}:")
+        self.emit("    break")
+        self.block(x.body)
+
+    def condition(self, x):
+        value = self.named(self.expression(x))
+        if isinstance(x, BinaryExpr) and x.operator.token_type not in ARITHMETIC:
+            # Comparisons already produce a boolean.
+            return value
+        return f"({value} is not None and {value} is not False)"
+
+    def variable(self, x):
+        """Returns the Python expression naming the local x refers to."""
+        if x.depth < len(self.scopes):
+            return self.scopes[-1-x.depth][x.slot]
+        distance = x.depth - len(self.scopes)
+        self.environments.add(distance)
+        return f"_e{distance}.values[{x.slot}]"
+
+    def stable(self, value):
+        # Temporaries, constants and literals cannot be changed by code
+        # emitted after them; variables can.
+        return (value[0] in "0123456789-'\"" or value in ("None", "True", "False")
+                or value[:2] in ("_t", "_n") and value[2:].isdigit())
+
+    def named(self, value):
+        # Python warns about "is" on a number or string literal.
+        if value[0] in "0123456789-'\"":
+            return self.assign(value)
+        return value
+
+    def operands(self, expressions):
+        """Returns the values of expressions, evaluated in order. A variable
+        read is copied to a temporary if a later operand could assign it.
+        """
+        values, ends = [], []
+        for expression in expressions:
+            values.append(self.expression(expression))
+            ends.append(len(self.out))
+        for i in reversed(range(len(values))):
+            if ends[i] != len(self.out) and not self.stable(values[i]):
+                t = self.temp()
+                self.out.insert(ends[i], "    " * self.indent + f"{t} = {values[i]}")
+                values[i] = t
+        return values
+
+    def expression(self, x):
+        """Emits the statements that evaluate x and returns a temporary,
+        variable or literal holding its value.
+        """
+        if isinstance(x, LiteralExpr):
+            if isinstance(x.value, float) and not math.isfinite(x.value):
+                return self.constant(x.value)
+            return repr(x.value)
+        elif isinstance(x, GroupingExpr):
+            return self.expression(x.expression)
+        elif isinstance(x, (VariableExpr, ThisExpr)):
+            if x.depth is not None:
+                return self.variable(x)
+            self.usesGlobals = True
+            name = repr(x.name.lexeme)
+            return self.assign(f"_gv[{name}] if {name} in _gv else _undefinedVariable({self.constant(x)})")
+        elif isinstance(x, AssignExpr):
+            value = self.expression(x.value)
+            if x.depth is None:
+                self.usesGlobals = True
+                return self.assign(f"_assignGlobal(_gv, {self.constant(x)}, {value})")
+            self.emit(f"{self.variable(x)} = {value}")
+            return value
+        elif isinstance(x, BinaryExpr):
+            return self.binary(x)
+        elif isinstance(x, UnaryExpr):
+            value = self.named(self.expression(x.right))
+            if x.operator.token_type == TT.BANG:
+                return self.assign(f"{value} is None or {value} is False")
+            if x.numeric:
+                return self.assign(f"-{value}")
+            return self.assign(f"-{value} if type({value}) is float else _negate(interpreter, {self.constant(x)}, {value})")
+        elif isinstance(x, LogicalExpr):
+            t = self.assign(self.expression(x.left))
+            if x.operator.token_type == TT.OR:
+                self.emit(f"if {t} is None or {t} is False:")
+            else:
+                self.emit(f"if {t} is not None and {t} is not False:")
+            self.nested(self.assignTo, t, x.right)
+            return t
+        elif isinstance(x, CallExpr):
+            if isinstance(x.callee, SuperExpr):
+                raise(Untranslatable("uses super"))
+            if isinstance(x.callee, GetExpr):
+                cache = self.constant(siteCache(x.callee, "get", x.callee.name))
+                node = self.constant(x)
+                # Like Interpreter.invoke, look up the method before
+                # evaluating the arguments.
+                obj = self.expression(x.callee.obj)
+                method = self.assign(f"_lookUpMethod({node}, {cache}, {obj})")
+                arguments = self.operands(x.arguments)
+                return self.assign(f"_invoke(interpreter, {node}, {method}, [{', '.join(arguments)}])")
+            callee, *arguments = self.operands([x.callee] + x.arguments)
+            return self.assign(f"_call(interpreter, {self.constant(x)}, {callee}, [{', '.join(arguments)}])")
+        elif isinstance(x, GetExpr):
+            cache = self.constant(siteCache(x, "get", x.name))
+            return self.assign(f"_getProperty({self.constant(x)}, {cache}, {self.expression(x.obj)})")
+        elif isinstance(x, SetExpr):
+            node = self.constant(x)
+            cache = self.constant(siteCache(x, "set", x.name))
+            obj = self.assign(f"_fieldTarget({node}, {self.expression(x.obj)})")
+            value = self.expression(x.value)
+            return self.assign(f"_setProperty({node}, {cache}, {obj}, {value})")
+        raise(Untranslatable("uses super"))
+
+    def binary(self, x):
+        tt = x.operator.token_type
+        left, right = self.operands([x.left, x.right])
+        if tt == TT.EQUAL_EQUAL:
+            return self.assign(f"_equal({left}, {right})")
+        if tt == TT.BANG_EQUAL:
+            return self.assign(f"not _equal({left}, {right})")
+
+        op = ARITHMETIC.get(tt) or COMPARISONS[tt]
+        if x.numeric:
+            # TypeInference proved both operands are numbers.
+            return self.assign(f"{left} {op} {right}")
+        return self.assign(f"{left} {op} {right} if type({left}) is float and type({right}) is float "
+                           f"else _binary({self.constant(x)}, {left}, {right})")
+
+class FunctionRecord:
+    __slots__ = ("calls", "backEdges", "tieredAt", "reason")
+
+    def __init__(self):
+        self.calls = 0
+        self.backEdges = 0
+        self.tieredAt = None
+        # Why the function could not be compiled.
+        self.reason = None
+
+class JIT:
+    """Counts calls and loop iterations per function declaration and
+    compiles hot functions. Installed as interpreter.jit.
+    """
+
+    def __init__(self, hotCalls=HOT_CALLS, hotBackEdges=HOT_BACK_EDGES):
+        self.hotCalls = hotCalls
+        self.hotBackEdges = hotBackEdges
+        self.functions = {}
+        # The function each while loop runs in.
+        self.loops = {}
+
+    def enter(self, declaration, values):
+        record = self.functions.get(declaration)
+        if record is None:
+            record = self.functions[declaration] = FunctionRecord()
+            self.registerLoops(declaration, declaration.body)
+        record.calls += 1
+        if record.reason is None and (record.calls >= self.hotCalls or
+                                      record.backEdges >= self.hotBackEdges):
+            # Methods are called with "this" ahead of their parameters.
+            isMethod = len(values) > len(declaration.params)
+            try:
+                declaration.compiled = Translator(declaration, isMethod).compile()
+                record.tieredAt = record.calls
+            except Untranslatable as e:
+                record.reason = str(e)
+
+    def registerLoops(self, declaration, statements):
+        for statement in statements:
+            if isinstance(statement, (FunctionStmt, ClassStmt)):
+                continue
+            if isinstance(statement, WhileStmt):
+                self.loops[statement] = declaration
+            self.registerLoops(declaration, children(statement))
+
+    def backEdge(self, loop):
+        declaration = self.loops.get(loop)
+        if declaration is not None:
+            self.functions[declaration].backEdges += 1
+
+    def report(self):
+        # Compiled functions are no longer counted.
+        lines = [f"{'calls':>10} {'loops':>10}  {'function':<24} tier"]
+        for declaration, record in sorted(self.functions.items(), key=lambda item: -item[1].calls):
+            if record.tieredAt is not None:
+                tier = f"compiled at call {record.tieredAt}"
+            elif record.reason is not None:
+                tier = f"interpreted: {record.reason}"
+            else:
+                tier = "interpreted: not hot"
+            name = f"{declaration.name.lexeme}:{declaration.name.line}"
+            lines.append(f"{record.calls:>10} {record.backEdges:>10}  {name:<24} {tier}")
+        return "\n".join(lines)
@@ -1,24 +1,83 @@
 #!/usr/local/bin/python3
 
 import sys
+import argparse
 from error_handler import ErrorHandler
 from scanner import Scanner
+from regex_scanner import RegexScanner
 from parser import Parser
 from ast_printer import AstPrinter
 from interpreter import Interpreter
+from closure_interpreter import ClosureInterpreter
+from vm import VM
+from disassembler import disassemble
+import inline_cache
 from resolver import Resolver
+from optimizer import Optimizer
+from type_inference import TypeInference
+from program_cache import ProgramCache
+from profiler import Profiler
+from sampler import Sampler
+from stats import COUNTING_ENGINES
+from jit import JIT
+import program_cache
+
+SCANNERS = {
+    "classic": Scanner,
+    "regex": RegexScanner,
+}
+
+ENGINES = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "vm": VM,
+}
 
 class Lox:
-    def __init__(self):
+    def __init__(self, engine="tree", show_bytecode=False, ic_stats=False, max_depth=None, optimize=False, use_cache=False, scanner="classic", profile=False, profile_stacks=None, sample=False, sample_interval=0.005, stats=False, type_report=False, jit=False, jit_report=False):
         self.error_handler = ErrorHandler()
-        self.interpreter = Interpreter(self.error_handler)
+        engines = COUNTING_ENGINES if stats else ENGINES
+        self.interpreter = engines[engine](self.error_handler)
+        if max_depth:
+            self.interpreter.maxFrames = max_depth
+        if profile:
+            self.interpreter.profiler = Profiler()
+        if jit or jit_report:
+            self.interpreter.jit = JIT()
+        self.jit_report = jit_report
+        self.show_bytecode = show_bytecode
+        self.ic_stats = ic_stats
+        self.optimize = optimize
+        self.scanner = SCANNERS[scanner]
+        self.profile_stacks = profile_stacks
+        self.sampler = Sampler(self.interpreter, sample_interval) if sample else None
+        self.type_report = type_report
+        # The type report is printed while compiling, so it bypasses the cache.
+        self.cache = ProgramCache("-O" if optimize else "") if use_cache and not type_report else None
 
     def run_file(self, path):
+        # The file is streamed through the scanner and parser rather than
+        # read into memory.
         with open(path, "r") as f:
-            self.run("".join(f.readlines()))
+            artifact = self.cache.path(path, f) if self.cache else None
+            statements = self.cache.load(artifact) if artifact else None
+            if statements is None:
+                statements = self.compile(f)
+                if statements is not None and artifact:
+                    self.cache.store(artifact, statements)
+        if statements is not None:
+            self.execute(statements)
+
         if self.error_handler.had_error or self.error_handler.had_runtime_error:
             exit(1)
 
+    def build_file(self, path):
+        """Writes the cached artifact for a script without running it."""
+        with open(path, "r") as f:
+            artifact = self.cache.path(path, f)
+            statements = self.compile(f)
+        return statements is not None and self.cache.store(artifact, statements)
+
     def run_prompt(self):
         while True:
             try:
@@ -31,28 +90,140 @@ class Lox:
                 exit(0)
 
     def run(self, source):
-        scanner = Scanner(self.error_handler, source)
-        tokens = scanner.scanTokens()
-        parser = Parser(self.error_handler, tokens)
+        statements = self.compile(source)
+        if statements is not None:
+            self.execute(statements)
+
+    def compile(self, source):
+        """Scans, parses, resolves and optionally optimizes source, a string
+        or a file object. Returns None if there was a compile error.
+        """
+        scanner = self.scanner(self.error_handler, source)
+        parser = Parser(self.error_handler, scanner.scan())
         statements = parser.parse()
 
         if self.error_handler.had_error:
-            return
+            return None
 
-        resolver = Resolver(self.error_handler, self.interpreter)
+        resolver = Resolver(self.error_handler)
         resolver.resolve(statements)
 
         # Stop if there was a resolution error.
         if self.error_handler.had_error:
-            return
+            return None
+
+        if self.optimize:
+            optimizer = Optimizer(self.error_handler)
+            statements = optimizer.optimize(statements)
+            print(f"Optimizer removed {optimizer.removed()} of {optimizer.nodesBefore} nodes.", file=sys.stderr)
 
+        if self.optimize or self.type_report:
+            inference = TypeInference()
+            inference.infer(statements)
+            if self.type_report:
+                print(inference.report(), file=sys.stderr)
+
+        return statements
+
+    def execute(self, statements):
+        if self.show_bytecode:
+            print(disassemble(self.interpreter.compile(statements)))
+
+        profiler = self.interpreter.profiler
+        if profiler:
+            profiler.start()
+        if self.sampler:
+            self.sampler.start()
         self.interpreter.interpret(statements)
+        if self.sampler:
+            self.sampler.stop()
+            print(self.sampler.report(), file=sys.stderr)
+        if profiler:
+            profiler.stop()
+            print(profiler.report(), file=sys.stderr)
+            if self.profile_stacks:
+                profiler.writeCollapsed(self.profile_stacks)
+        if self.interpreter.stats:
+            print(self.interpreter.stats.report(), file=sys.stderr)
+        if self.jit_report:
+            print(self.interpreter.jit.report(), file=sys.stderr)
+
+        # Report while the program's AST, which owns the caches, is alive.
+        if self.ic_stats:
+            print(inline_cache.report(), file=sys.stderr)
 
 if __name__ == "__main__":
-    lox = Lox()
-    if len(sys.argv) > 2:
-        print("Usage: lox.py [script]")
-    elif len(sys.argv) == 2:
-        lox.run_file(sys.argv[1])
+    argparser = argparse.ArgumentParser(prog="lox.py")
+    argparser.add_argument("scripts", nargs="*", metavar="script")
+    argparser.add_argument("-O", dest="optimize", action="store_true",
+                           help="fold constants, prune dead code and skip proven number checks")
+    argparser.add_argument("--engine", choices=ENGINES.keys(), default="tree",
+                           help="execution engine (default: tree)")
+    argparser.add_argument("--scanner", choices=SCANNERS.keys(), default="classic",
+                           help="tokenizer; regex is faster on large files (default: classic)")
+    argparser.add_argument("--disassemble", action="store_true",
+                           help="print the compiled bytecode before running (vm engine only)")
+    argparser.add_argument("--max-depth", type=int,
+                           help="maximum Lox call depth (vm engine only)")
+    argparser.add_argument("--ic-stats", action="store_true",
+                           help="print inline cache hit/miss counts per property site on exit")
+    argparser.add_argument("--profile", action="store_true",
+                           help="print calls, time and allocations per Lox function on exit")
+    argparser.add_argument("--profile-stacks", metavar="FILE",
+                           help="with --profile, also write collapsed stacks for flame graph tools")
+    argparser.add_argument("--sample", action="store_true",
+                           help="sample the running line and call stack and print the hottest on exit")
+    argparser.add_argument("--sample-interval", type=float, default=5, metavar="MS",
+                           help="milliseconds between samples (default: 5)")
+    argparser.add_argument("--stats", action="store_true",
+                           help="count nodes, environments and allocations and print them on exit")
+    argparser.add_argument("--jit", action="store_true",
+                           help="compile hot functions to Python (tree engine only)")
+    argparser.add_argument("--jit-report", action="store_true",
+                           help="with --jit, print which functions were compiled and why others were not")
+    argparser.add_argument("--type-report", action="store_true",
+                           help="infer number types and print which operations stay checked and why")
+    argparser.add_argument("--cache", action="store_true",
+                           help=f"read and write signed {program_cache.SUFFIX} artifacts in {program_cache.defaultDirectory()}")
+    argparser.add_argument("--compile", action="store_true",
+                           help="prebuild cached artifacts for the given scripts without running them (implies --cache)")
+    argparser.add_argument("--clear-cache", action="store_true",
+                           help="remove cached artifacts for the given scripts or directories (default: all)")
+    args = argparser.parse_args()
+
+    if args.clear_cache:
+        removed = program_cache.clear(args.scripts)
+        print(f"Removed {removed} cached artifact(s).")
+        exit(0)
+    if len(args.scripts) > 1 and not args.compile:
+        argparser.error("only one script can be run at a time")
+    if args.disassemble and args.engine != "vm":
+        argparser.error("--disassemble requires --engine=vm")
+    if args.max_depth and args.engine != "vm":
+        argparser.error("--max-depth requires --engine=vm")
+    if args.profile_stacks and not args.profile:
+        argparser.error("--profile-stacks requires --profile")
+    if args.profile and args.engine == "vm":
+        argparser.error("--profile requires --engine=tree or --engine=closure")
+    if args.stats and args.engine == "vm":
+        argparser.error("--stats requires --engine=tree or --engine=closure")
+    if args.jit_report and not args.jit:
+        argparser.error("--jit-report requires --jit")
+    if args.jit and args.engine != "tree":
+        argparser.error("--jit requires --engine=tree")
+    if args.jit and args.stats:
+        argparser.error("--stats counts interpreted nodes and cannot be combined with --jit")
+
+    lox = Lox(args.engine, args.disassemble, args.ic_stats, args.max_depth, args.optimize,
+              args.cache or args.compile, args.scanner, args.profile, args.profile_stacks,
+              args.sample, args.sample_interval / 1000, args.stats, args.type_report,
+              args.jit, args.jit_report)
+    if args.compile:
+        failed = [script for script in args.scripts if not lox.build_file(script)]
+        for script in failed:
+            print(f"Could not build {script}.", file=sys.stderr)
+        exit(1 if failed else 0)
+    elif args.scripts:
+        lox.run_file(args.scripts[0])
     else:
         lox.run_prompt()
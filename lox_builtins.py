@@ -0,0 +1,113 @@
+#!/usr/local/bin/python3
+
+import math
+import time
+
+from native import NativeError
+
+# The native functions every engine defines as globals.
+
+def checkNumber(value, what="Argument"):
+    if type(value) is float or type(value) is int:
+        return value
+    raise(NativeError(f"{what} must be a number."))
+
+def checkString(value, what="Argument"):
+    if type(value) is str:
+        return value
+    raise(NativeError(f"{what} must be a string."))
+
+def checkFinite(value, what="Argument"):
+    # int(), math.floor() and math.ceil() fail on infinities and NaN.
+    if math.isfinite(checkNumber(value, what)):
+        return value
+    raise(NativeError(f"{what} must be a finite number."))
+
+def checkIndex(value, limit, what="Index"):
+    checkFinite(value, what)
+    if value != int(value) or not 0 <= value <= limit:
+        raise(NativeError(f"{what} out of range."))
+    return int(value)
+
+def stringify(value):
+    # The way print shows a value.
+    if value is None:
+        return "nil"
+    return str(value)
+
+def clock():
+    return time.perf_counter()
+
+def length(s):
+    return float(len(checkString(s)))
+
+def substring(s, start, end):
+    checkString(s)
+    end = checkIndex(end, len(s), "End")
+    start = checkIndex(start, end, "Start")
+    return s[start:end]
+
+def indexOf(s, part):
+    return float(checkString(s).find(checkString(part)))
+
+def upper(s):
+    return checkString(s).upper()
+
+def lower(s):
+    return checkString(s).lower()
+
+def toNumber(s):
+    try:
+        return float(checkString(s))
+    except ValueError:
+        return None
+
+def formatNumber(n, digits):
+    checkNumber(n)
+    digits = checkIndex(digits, 20, "Digits")
+    return f"{n:.{digits}f}"
+
+def floor(n):
+    return float(math.floor(checkFinite(n)))
+
+def ceil(n):
+    return float(math.ceil(checkFinite(n)))
+
+def sqrt(n):
+    if checkNumber(n) < 0:
+        raise(NativeError("Argument must not be negative."))
+    return math.sqrt(n)
+
+def power(base, exponent):
+    try:
+        return float(checkNumber(base) ** checkNumber(exponent))
+    except (OverflowError, ZeroDivisionError, TypeError):
+        raise(NativeError("Result is not a number."))
+
+def absolute(n):
+    return abs(checkNumber(n))
+
+def minimum(a, b):
+    return min(checkNumber(a), checkNumber(b))
+
+def maximum(a, b):
+    return max(checkNumber(a), checkNumber(b))
+
+BUILTINS = [
+    ("clock", 0, clock),
+    ("str", 1, stringify),
+    ("num", 1, toNumber),
+    ("len", 1, length),
+    ("substring", 3, substring),
+    ("indexOf", 2, indexOf),
+    ("upper", 1, upper),
+    ("lower", 1, lower),
+    ("formatNumber", 2, formatNumber),
+    ("floor", 1, floor),
+    ("ceil", 1, ceil),
+    ("sqrt", 1, sqrt),
+    ("pow", 2, power),
+    ("abs", 1, absolute),
+    ("min", 2, minimum),
+    ("max", 2, maximum),
+]
@@ -3,6 +3,8 @@
 from abc import ABC, abstractmethod
 
 class LoxCallable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def call(self, interpreter, arguments):
         pass
@@ -1,31 +1,65 @@
 from lox_callable import LoxCallable
 from lox_instance import LoxInstance
+from shape import Shape
 
 class LoxClass(LoxCallable):
-    def __init__(self, name, superclass, methods):
+    def __init__(self, name, superclass, methods, instanceType=LoxInstance):
         self.name = name
         self.superclass = superclass
         self.methods = methods
 
+        # Native classes keep their data in a subclass of LoxInstance, which
+        # their subclasses have to create too.
+        self.instanceType = superclass.instanceType if superclass else instanceType
+
+        # The layout of instances that have no fields yet.
+        self.rootShape = Shape(self, {})
+
+        # Bumped whenever the method table changes, invalidating inline
+        # cache entries recorded against the old table.
+        self.version = 0
+
+        # Classes never change once declared, so inherited methods are
+        # copied down into a single table and lookups never walk the chain.
+        self.methodTable = {}
+        if superclass:
+            self.methodTable.update(superclass.methodTable)
+        self.methodTable.update(methods)
+        self.updateInitializer()
+
+    def inherit(self, superclass):
+        self.superclass = superclass
+        self.instanceType = superclass.instanceType
+        self.methodTable = dict(superclass.methodTable)
+        self.methodTable.update(self.methods)
+        self.updateInitializer()
+        self.version += 1
+
+    def defineMethod(self, name, method):
+        self.methods[name] = method
+        self.methodTable[name] = method
+        self.updateInitializer()
+        self.version += 1
+
+    def updateInitializer(self):
+        self.initializer = self.methodTable.get("init")
+        self.initializerArity = self.initializer.arity() if self.initializer else 0
+
     def findMethod(self, name):
-        if name in self.methods:
-            return self.methods[name]
-        if self.superclass:
-            return self.superclass.findMethod(name)
-        return None
+        return self.methodTable.get(name)
 
     def call(self, interpreter, arguments):
-        instance = LoxInstance(self)
-        initializer = self.findMethod("init")
-        if initializer:
-            initializer.bind(instance).call(interpreter, arguments)
+        instance = self.instanceType(self)
+        if interpreter.profiler is not None:
+            interpreter.profiler.allocate()
+        if interpreter.stats is not None:
+            interpreter.stats.instances += 1
+        if self.initializer:
+            self.initializer.callMethod(interpreter, instance, arguments)
         return instance
 
     def arity(self):
-        initializer = self.findMethod("init")
-        if not initializer:
-            return 0
-        return initializer.arity()
+        return self.initializerArity
 
     def __str__(self):
         return self.name
@@ -0,0 +1,120 @@
+#!/usr/local/bin/python3
+
+from lox_instance import LoxInstance
+from native import NativeError, nativeClass
+from lox_builtins import checkIndex, stringify
+
+# The List and Map classes. Their instances keep their elements in a
+# Python list or dict, and their methods are natives, so indexing, append
+# and key lookup are single container operations.
+
+class LoxList(LoxInstance):
+    __slots__ = ("items",)
+
+    def __init__(self, klass):
+        super().__init__(klass)
+        self.items = []
+
+    def __str__(self):
+        return "[" + ", ".join(stringify(item) for item in self.items) + "]"
+
+def mapKey(key):
+    # True == 1.0 in Python but not in Lox, so booleans are keyed apart.
+    if type(key) is bool:
+        return (key,)
+    return key
+
+def loxKey(key):
+    if type(key) is tuple:
+        return key[0]
+    return key
+
+class LoxMap(LoxInstance):
+    __slots__ = ("entries",)
+
+    def __init__(self, klass):
+        super().__init__(klass)
+        self.entries = {}
+
+    def __str__(self):
+        return "{" + ", ".join(f"{stringify(loxKey(key))}: {stringify(value)}"
+                               for key, value in self.entries.items()) + "}"
+
+def listAppend(self, value):
+    self.items.append(value)
+
+def listGet(self, index):
+    return self.items[checkIndex(index, len(self.items)-1)]
+
+def listSet(self, index, value):
+    self.items[checkIndex(index, len(self.items)-1)] = value
+
+def listInsert(self, index, value):
+    self.items.insert(checkIndex(index, len(self.items)), value)
+
+def listRemove(self, index):
+    return self.items.pop(checkIndex(index, len(self.items)-1))
+
+def listPop(self):
+    if not self.items:
+        raise(NativeError("Can't pop from an empty list."))
+    return self.items.pop()
+
+def listClear(self):
+    self.items.clear()
+
+def listLength(self):
+    return float(len(self.items))
+
+def mapGet(self, key):
+    return self.entries.get(mapKey(key))
+
+def mapSet(self, key, value):
+    self.entries[mapKey(key)] = value
+
+def mapHas(self, key):
+    return mapKey(key) in self.entries
+
+def mapRemove(self, key):
+    return self.entries.pop(mapKey(key), None)
+
+def mapClear(self):
+    self.entries.clear()
+
+def mapLength(self):
+    return float(len(self.entries))
+
+def mapKeys(self):
+    keys = LoxList(LIST_CLASS)
+    keys.items = [loxKey(key) for key in self.entries]
+    return keys
+
+def mapValues(self):
+    values = LoxList(LIST_CLASS)
+    values.items = list(self.entries.values())
+    return values
+
+# Native classes never change, so every interpreter shares them.
+LIST_CLASS = nativeClass("List", LoxList, [
+    ("append", 1, listAppend),
+    ("get", 1, listGet),
+    ("set", 2, listSet),
+    ("insert", 2, listInsert),
+    ("remove", 1, listRemove),
+    ("pop", 0, listPop),
+    ("clear", 0, listClear),
+    ("length", 0, listLength),
+])
+
+MAP_CLASS = nativeClass("Map", LoxMap, [
+    ("get", 1, mapGet),
+    ("set", 2, mapSet),
+    ("has", 1, mapHas),
+    ("remove", 1, mapRemove),
+    ("clear", 0, mapClear),
+    ("length", 0, mapLength),
+    ("keys", 0, mapKeys),
+    ("values", 0, mapValues),
+])
+
+COLLECTIONS = [LIST_CLASS, MAP_CLASS]
@@ -2,34 +2,54 @@
 
 from environment import Environment
 from lox_callable import LoxCallable
-from lox_return import LoxReturn
+from error_handler import LoxRuntimeException
 
 class LoxFunction(LoxCallable):
-    def __init__(self, declaration, closure, isInitializer=False):
+    __slots__ = ("declaration", "closure", "isInitializer", "receiver")
+
+    def __init__(self, declaration, closure, isInitializer=False, receiver=None):
         self.declaration = declaration
         self.closure = closure
         self.isInitializer = isInitializer
+        self.receiver = receiver
 
     def bind(self, instance):
-        environment = Environment(self.closure)
-        environment.define("this", instance)
-        return LoxFunction(self.declaration, environment, self.isInitializer)
+        return LoxFunction(self.declaration, self.closure, self.isInitializer, instance)
 
     def call(self, interpreter, arguments):
-        environment = Environment(self.closure)
-
-        for i in range(0, len(self.declaration.params)):
-            environment.define(self.declaration.params[i].lexeme, arguments[i])
-
+        if self.receiver is not None:
+            return self.callMethod(interpreter, self.receiver, arguments)
+        return self.execute(interpreter, arguments)
+
+    def callMethod(self, interpreter, instance, arguments):
+        # Methods keep "this" in the first slot of their frame, ahead of the
+        # parameters, so calling one needs no bound copy of the function.
+        return self.execute(interpreter, [instance, *arguments])
+
+    def execute(self, interpreter, values):
+        declaration = self.declaration
+        if declaration.compiled is None and interpreter.jit is not None:
+            interpreter.jit.enter(declaration, values)
+
+        profiler = interpreter.profiler
+        if profiler is not None:
+            profiler.enter(declaration.name)
         try:
-            interpreter.executeBlock(self.declaration.body, environment)
-        except LoxReturn as returnValue:
-            if self.isInitializer:
-                return self.closure.getAt(0, "this")
-            return returnValue.value
+            if declaration.compiled is not None:
+                value = declaration.compiled(interpreter, self.closure, values)
+                return values[0] if self.isInitializer else value
+            completion = interpreter.executeBlock(declaration.body, Environment(self.closure, values))
+        except RecursionError:
+            # The tree-walking engines run Lox calls on the Python stack.
+            raise(LoxRuntimeException(self.declaration.name, "Stack overflow."))
+        finally:
+            if profiler is not None:
+                profiler.exit()
 
         if self.isInitializer:
-            return self.closure.getAt(0, "this")
+            return values[0]
+        if completion is not None:
+            return completion.value
 
         return None
 
@@ -1,22 +1,49 @@
 from error_handler import LoxRuntimeException
 
 class LoxInstance:
+    # Field values live in a list laid out by a shape shared with other
+    # instances of the class, rather than in a dict per instance.
+    __slots__ = ("klass", "shape", "values")
+
     def __init__(self, klass):
         self.klass = klass
-        self.fields = {}
+        self.shape = klass.rootShape
+        self.values = []
+
+    def get(self, name, cache=None):
+        if cache:
+            index, method = cache.lookupProperty(self.shape)
+        else:
+            index = self.shape.indexes.get(name.lexeme)
+            method = self.klass.findMethod(name.lexeme)
 
-    def get(self, name):
-        if name.lexeme in self.fields:
-            return self.fields[name.lexeme]
+        # Fields shadow methods.
+        if index is not None:
+            return self.values[index]
 
-        method = self.klass.findMethod(name.lexeme)
         if method:
             return method.bind(self)
 
         raise(LoxRuntimeException(name, f"Undefined property '{name.lexeme}'"))
 
-    def set(self, name, value):
-        self.fields[name.lexeme] = value
+    def set(self, name, value, cache=None):
+        if cache:
+            index, shape = cache.lookupStore(self.shape)
+        else:
+            index, shape = self.shape.store(name.lexeme)
+        self.store(index, shape, value)
+
+    def setField(self, name, value):
+        index, shape = self.shape.store(name)
+        self.store(index, shape, value)
+
+    def store(self, index, shape, value):
+        if shape is self.shape:
+            self.values[index] = value
+        else:
+            # A new field always goes at the end.
+            self.shape = shape
+            self.values.append(value)
 
     def __str__(self):
         return f"{self.klass.name} instance"
@@ -1,5 +1,12 @@
 #!/usr/local/bin/python3
 
-class LoxReturn(Exception):
+class LoxReturn:
+    """Completion signal for a `return` statement.
+
+    Executing a statement yields None when control falls through, or the
+    LoxReturn produced by a `return` inside it. Blocks, loops and ifs pass a
+    LoxReturn straight up until the enclosing function call consumes it.
+    """
+
     def __init__(self, value):
         self.value = value
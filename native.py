@@ -0,0 +1,87 @@
+#!/usr/local/bin/python3
+
+from lox_callable import LoxCallable
+from lox_class import LoxClass
+from rope import Rope, materialize
+
+class NativeError(Exception):
+    """Raised by a native to report a Lox runtime error. The engine making
+    the call turns it into a LoxRuntimeException at the call's line.
+    """
+    pass
+
+def materializeAll(arguments):
+    # Natives are plain Python and only ever see str, never a Rope.
+    for argument in arguments:
+        if type(argument) is Rope:
+            return [materialize(argument) for argument in arguments]
+    return arguments
+
+class NativeFunction(LoxCallable):
+    """A Lox callable implemented by a Python function.
+
+    Calling one passes the Lox arguments straight to the Python function,
+    with no Environment and no executeBlock, and returns its result.
+    """
+
+    __slots__ = ("name", "argCount", "function")
+
+    def __init__(self, name, argCount, function):
+        self.name = name
+        self.argCount = argCount
+        self.function = function
+
+    def call(self, interpreter, arguments):
+        arguments = materializeAll(arguments)
+        if interpreter.profiler is None:
+            return self.function(*arguments)
+        return self.profile(interpreter.profiler, *arguments)
+
+    def profile(self, profiler, *arguments):
+        profiler.push(profiler.profileFor(f"<native {self.name}>", None))
+        try:
+            return self.function(*arguments)
+        finally:
+            profiler.exit()
+
+    def arity(self):
+        return self.argCount
+
+    def __str__(self):
+        return "<native fn>"
+
+class NativeMethod(NativeFunction):
+    """A method of a native class. The Python function takes the instance
+    as its first argument.
+    """
+
+    __slots__ = ("receiver",)
+
+    def __init__(self, name, argCount, function, receiver=None):
+        super().__init__(name, argCount, function)
+        self.receiver = receiver
+
+    def bind(self, instance):
+        return NativeMethod(self.name, self.argCount, self.function, instance)
+
+    def call(self, interpreter, arguments):
+        return self.callMethod(interpreter, self.receiver, arguments)
+
+    def callMethod(self, interpreter, instance, arguments):
+        arguments = materializeAll(arguments)
+        if interpreter.profiler is None:
+            return self.function(instance, *arguments)
+        return self.profile(interpreter.profiler, instance, *arguments)
+
+def defineNatives(globals, natives):
+    """Defines every (name, arity, function) in natives as a global."""
+    for name, argCount, function in natives:
+        globals.define(name, NativeFunction(name, argCount, function))
+
+def nativeClass(name, instanceType, methods):
+    """Returns a class whose instances are instanceType and whose methods
+    are the (name, arity, function) natives in methods.
+    """
+    methods = {method: NativeMethod(f"{name}.{method}", argCount, function)
+               for method, argCount, function in methods}
+    return LoxClass(name, None, methods, instanceType)
@@ -0,0 +1,181 @@
+#!/usr/local/bin/python3
+
+from visitor import Visitor
+from expr import *
+from stmt import *
+from interpreter import Interpreter
+from lox_types import TokenType as TT
+from rope import materialize
+
+def children(x):
+    """Returns the direct child nodes of an expression or statement."""
+    if isinstance(x, AssignExpr):
+        return [x.value]
+    elif isinstance(x, (BinaryExpr, LogicalExpr)):
+        return [x.left, x.right]
+    elif isinstance(x, CallExpr):
+        return [x.callee] + x.arguments
+    elif isinstance(x, GetExpr):
+        return [x.obj]
+    elif isinstance(x, GroupingExpr):
+        return [x.expression]
+    elif isinstance(x, SetExpr):
+        return [x.obj, x.value]
+    elif isinstance(x, UnaryExpr):
+        return [x.right]
+    elif isinstance(x, BlockStmt):
+        return x.statements
+    elif isinstance(x, ClassStmt):
+        return ([x.superclass] if x.superclass else []) + x.methods
+    elif isinstance(x, (ExpressionStmt, PrintStmt)):
+        return [x.expression]
+    elif isinstance(x, FunctionStmt):
+        return x.body
+    elif isinstance(x, IfStmt):
+        return [x.condition, x.thenBranch] + ([x.elseBranch] if x.elseBranch else [])
+    elif isinstance(x, ReturnStmt):
+        return [x.value] if x.value else []
+    elif isinstance(x, VariableStmt):
+        return [x.initializer] if x.initializer else []
+    elif isinstance(x, WhileStmt):
+        return [x.condition, x.body]
+    return []
+
+def countNodes(x):
+    if isinstance(x, list):
+        return sum(countNodes(node) for node in x)
+    return 1 + sum(countNodes(child) for child in children(x))
+
+class Optimizer(Visitor):
+    """Simplifies a resolved AST before it is executed.
+
+    Folds operators whose operands are literals, drops grouping wrappers,
+    prunes branches and loops with constant conditions and removes
+    statements that follow a return. Nodes are rewritten in place so the
+    resolution data and caches on surviving nodes are kept.
+    """
+
+    def __init__(self, error_handler):
+        # Folding evaluates literal-only expressions with the real
+        # interpreter, so folded results match runtime semantics exactly.
+        self.evaluator = Interpreter(error_handler)
+        self.nodesBefore = 0
+        self.nodesAfter = 0
+
+    def optimize(self, statements):
+        self.nodesBefore += countNodes(statements)
+        statements = self.optimizeStatements(statements)
+        self.nodesAfter += countNodes(statements)
+        return statements
+
+    def removed(self):
+        return self.nodesBefore - self.nodesAfter
+
+    def optimizeStatements(self, statements):
+        optimized = []
+        for statement in statements:
+            statement = statement.accept(self)
+            if statement is None:
+                continue
+            optimized.append(statement)
+            if isinstance(statement, ReturnStmt):
+                # Anything after a return in the same block is unreachable.
+                break
+        return optimized
+
+    def optimizeBranch(self, statement):
+        # A branch must stay a statement, so removed ones become empty blocks.
+        statement = statement.accept(self)
+        if statement is None:
+            return BlockStmt([])
+        return statement
+
+    def fold(self, x):
+        try:
+            # Literals hold plain strings, never a Rope.
+            return LiteralExpr(materialize(self.evaluator.evaluate(x)))
+        except Exception:
+            # Leave anything that fails (e.g. "a" - 1) to fail at runtime.
+            return x
+
+    def isLiteral(self, x):
+        return isinstance(x, LiteralExpr)
+
+    def visit(self, x):
+        if isinstance(x, AssignExpr):
+            x.value = x.value.accept(self)
+            return x
+        elif isinstance(x, BinaryExpr):
+            x.left = x.left.accept(self)
+            x.right = x.right.accept(self)
+            if self.isLiteral(x.left) and self.isLiteral(x.right):
+                return self.fold(x)
+            return x
+        elif isinstance(x, CallExpr):
+            x.callee = x.callee.accept(self)
+            x.arguments = [argument.accept(self) for argument in x.arguments]
+            return x
+        elif isinstance(x, GetExpr):
+            x.obj = x.obj.accept(self)
+            return x
+        elif isinstance(x, GroupingExpr):
+            return x.expression.accept(self)
+        elif isinstance(x, LogicalExpr):
+            x.left = x.left.accept(self)
+            x.right = x.right.accept(self)
+            if self.isLiteral(x.left):
+                truthy = self.evaluator.isTruthy(x.left.value)
+                if x.operator.token_type == TT.OR:
+                    return x.left if truthy else x.right
+                return x.right if truthy else x.left
+            return x
+        elif isinstance(x, SetExpr):
+            x.obj = x.obj.accept(self)
+            x.value = x.value.accept(self)
+            return x
+        elif isinstance(x, UnaryExpr):
+            x.right = x.right.accept(self)
+            if self.isLiteral(x.right):
+                return self.fold(x)
+            return x
+        elif isinstance(x, BlockStmt):
+            x.statements = self.optimizeStatements(x.statements)
+            return x
+        elif isinstance(x, ClassStmt):
+            for method in x.methods:
+                method.accept(self)
+            return x
+        elif isinstance(x, (ExpressionStmt, PrintStmt)):
+            x.expression = x.expression.accept(self)
+            return x
+        elif isinstance(x, FunctionStmt):
+            x.body = self.optimizeStatements(x.body)
+            return x
+        elif isinstance(x, IfStmt):
+            x.condition = x.condition.accept(self)
+            if self.isLiteral(x.condition):
+                if self.evaluator.isTruthy(x.condition.value):
+                    return x.thenBranch.accept(self)
+                if x.elseBranch:
+                    return x.elseBranch.accept(self)
+                return None
+            x.thenBranch = self.optimizeBranch(x.thenBranch)
+            if x.elseBranch:
+                x.elseBranch = self.optimizeBranch(x.elseBranch)
+            return x
+        elif isinstance(x, ReturnStmt):
+            if x.value:
+                x.value = x.value.accept(self)
+            return x
+        elif isinstance(x, VariableStmt):
+            if x.initializer:
+                x.initializer = x.initializer.accept(self)
+            return x
+        elif isinstance(x, WhileStmt):
+            x.condition = x.condition.accept(self)
+            if self.isLiteral(x.condition) and not self.evaluator.isTruthy(x.condition.value):
+                return None
+            x.body = self.optimizeBranch(x.body)
+            return x
+        # Literals, variables, this and super have nothing to simplify.
+        return x
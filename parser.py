@@ -9,8 +9,11 @@ class Parser:
     def __init__(self, error_handler, tokens):
         self.error_handler = error_handler
 
-        self.tokens = tokens
-        self.current = 0
+        # Tokens are pulled one at a time from any iterable, such as
+        # Scanner.scan(), keeping only the current and previous token.
+        self.tokens = iter(tokens)
+        self.previousToken = None
+        self.currentToken = next(self.tokens)
 
     def parse(self):
         statements = []
@@ -308,17 +311,18 @@ class Parser:
 
     def advance(self):
         if not self.isAtEnd():
-            self.current += 1
+            self.previousToken = self.currentToken
+            self.currentToken = next(self.tokens)
         return self.previous()
 
     def isAtEnd(self):
         return self.peek().token_type == TT.EOF
 
     def peek(self):
-        return self.tokens[self.current]
+        return self.currentToken
 
     def previous(self):
-        return self.tokens[self.current-1]
+        return self.previousToken
 
     def error(self, token, message):
         self.error_handler.error(token, message)
@@ -0,0 +1,114 @@
+#!/usr/local/bin/python3
+
+import time
+
+class FunctionProfile:
+    __slots__ = ("name", "line", "calls", "inclusive", "exclusive", "allocations", "active")
+
+    def __init__(self, name, line):
+        self.name = name
+        self.line = line
+        self.calls = 0
+        self.inclusive = 0.0
+        self.exclusive = 0.0
+        self.allocations = 0
+        # How many calls are on the stack, so recursive calls do not count
+        # their time twice towards the inclusive total.
+        self.active = 0
+
+    def label(self):
+        if self.line is None:
+            return self.name
+        return f"{self.name}:{self.line}"
+
+class Frame:
+    __slots__ = ("profile", "start", "children", "path")
+
+    def __init__(self, profile, start, path):
+        self.profile = profile
+        self.start = start
+        self.children = 0.0
+        self.path = path
+
+class Profiler:
+    """Records calls, wall time and allocations per Lox function.
+
+    Functions are keyed by their declaration's name and line. Inclusive time
+    covers everything a function's calls did; exclusive time leaves out the
+    time spent in the functions it called. Allocations are the instances and
+    closures a function created itself. Time outside any function is charged
+    to <script>.
+
+    The interpreter calls enter and exit around every Lox call while a
+    profiler is installed as interpreter.profiler.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.profiles = {}
+        self.stack = []
+        # Exclusive time per call path, for collapsed-stack output.
+        self.paths = {}
+
+    def start(self):
+        self.push(self.profileFor("<script>", None))
+
+    def stop(self):
+        while self.stack:
+            self.exit()
+
+    def profileFor(self, name, line):
+        key = (name, line)
+        profile = self.profiles.get(key)
+        if profile is None:
+            profile = self.profiles[key] = FunctionProfile(name, line)
+        return profile
+
+    def enter(self, name):
+        self.push(self.profileFor(name.lexeme, name.line))
+
+    def push(self, profile):
+        path = profile.label()
+        if self.stack:
+            path = f"{self.stack[-1].path};{path}"
+        profile.calls += 1
+        profile.active += 1
+        self.stack.append(Frame(profile, self.clock(), path))
+
+    def exit(self):
+        frame = self.stack.pop()
+        elapsed = self.clock() - frame.start
+        exclusive = elapsed - frame.children
+
+        profile = frame.profile
+        profile.active -= 1
+        if profile.active == 0:
+            profile.inclusive += elapsed
+        profile.exclusive += exclusive
+        self.paths[frame.path] = self.paths.get(frame.path, 0.0) + exclusive
+
+        if self.stack:
+            self.stack[-1].children += elapsed
+
+    def allocate(self):
+        if self.stack:
+            self.stack[-1].profile.allocations += 1
+
+    def report(self):
+        profiles = sorted(self.profiles.values(), key=lambda p: -p.exclusive)
+        lines = [f"{'calls':>10} {'inclusive ms':>13} {'exclusive ms':>13} {'allocs':>9}  function"]
+        for p in profiles:
+            lines.append(f"{p.calls:>10} {p.inclusive * 1000:>13.3f} {p.exclusive * 1000:>13.3f} "
+                         f"{p.allocations:>9}  {p.label()}")
+        return "\n".join(lines)
+
+    def writeCollapsed(self, path):
+        """Writes one "frame;frame;frame weight" line per call path, the
+        format flamegraph.pl and speedscope read. Weights are exclusive
+        microseconds.
+        """
+        with open(path, "w") as f:
+            for stack, seconds in sorted(self.paths.items()):
+                weight = round(seconds * 1e6)
+                if weight > 0:
+                    f.write(f"{stack} {weight}\n")
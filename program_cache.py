@@ -0,0 +1,177 @@
+#!/usr/local/bin/python3
+
+import os
+import sys
+import hmac
+import zlib
+import pickle
+import hashlib
+import secrets
+
+# Artifacts live in a per-user directory, never next to the scripts, and
+# are signed with a key kept there. Only the owner can write either.
+SUFFIX = ".loxc"
+MAGIC = b"LOXC\x02"
+BLOCK_SIZE = 1 << 16
+KEY_FILE = "key"
+KEY_SIZE = 32
+
+# Modules whose behavior is baked into a cached AST. Any change to them
+# changes the interpreter version and so invalidates every artifact.
+FRONTEND_MODULES = ["token", "lox_types", "scanner", "regex_scanner", "parser",
+                    "expr", "stmt", "resolver", "optimizer", "type_inference",
+                    "program_cache"]
+
+def interpreterVersion():
+    digest = hashlib.sha256(sys.version.encode())
+    here = os.path.dirname(os.path.abspath(__file__))
+    for module in FRONTEND_MODULES:
+        with open(os.path.join(here, f"{module}.py"), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def defaultDirectory():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "pylox")
+
+def scriptPrefix(script):
+    """Returns the start of the name of every artifact of a script."""
+    stem = os.path.splitext(os.path.basename(script))[0]
+    location = hashlib.sha256(os.path.abspath(script).encode()).hexdigest()
+    return f"{stem}.{location[:16]}."
+
+def isPrivate(directory):
+    # Anyone else able to write here could plant artifacts or the key.
+    status = os.stat(directory)
+    if hasattr(os, "getuid") and status.st_uid != os.getuid():
+        return False
+    return not status.st_mode & 0o022
+
+class ProgramCache:
+    """On-disk cache of scanned, parsed and resolved programs (--cache).
+
+    An artifact is the resolved statement list, pickled and compressed,
+    stored under a name derived from a hash of the source, the interpreter
+    version and the options that affect the AST (such as -O). A warm run
+    loads it instead of running the Scanner, Parser and Resolver.
+
+    Unpickling can run arbitrary code, so every artifact carries an HMAC
+    made with a per-user key, and one whose HMAC does not match is never
+    unpickled. The cache is unused if its directory is writable by others.
+    """
+
+    def __init__(self, options="", directory=None):
+        self.options = options
+        self.version = interpreterVersion()
+        self.directory = directory or defaultDirectory()
+        self.secret = None
+
+    def signingKey(self):
+        """Returns the key, creating it on first use, or None if the cache
+        directory is not private to this user.
+        """
+        if self.secret is None:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not isPrivate(self.directory):
+                return None
+            path = os.path.join(self.directory, KEY_FILE)
+            try:
+                descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(descriptor, "wb") as f:
+                    f.write(secrets.token_bytes(KEY_SIZE))
+            except FileExistsError:
+                pass
+            if not isPrivate(path):
+                return None
+            with open(path, "rb") as f:
+                secret = f.read()
+            if len(secret) != KEY_SIZE:
+                return None
+            self.secret = secret
+        return self.secret
+
+    def sign(self, payload):
+        return hmac.new(self.secret, payload, hashlib.sha256).digest()
+
+    def key(self, source):
+        """Hashes the source file in blocks and rewinds it."""
+        digest = hashlib.sha256(self.version.encode())
+        digest.update(self.options.encode())
+        source.seek(0)
+        for block in iter(lambda: source.read(BLOCK_SIZE), ""):
+            digest.update(block.encode())
+        source.seek(0)
+        return digest.hexdigest()
+
+    def path(self, script, source):
+        """Returns the artifact path for a script and its open source file.
+
+        The name starts with the script and the options, so storing it
+        replaces only older artifacts built with the same options.
+        """
+        options = hashlib.sha256(self.options.encode()).hexdigest()[:8]
+        return os.path.join(self.directory, f"{scriptPrefix(script)}{options}.{self.key(source)[:16]}{SUFFIX}")
+
+    def load(self, path):
+        try:
+            if self.signingKey() is None:
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if not data.startswith(MAGIC):
+            return None
+        signature = data[len(MAGIC):len(MAGIC)+hashlib.sha256().digest_size]
+        payload = data[len(MAGIC)+len(signature):]
+        if not hmac.compare_digest(signature, self.sign(payload)):
+            return None
+        try:
+            return pickle.loads(zlib.decompress(payload))
+        except Exception:
+            return None
+
+    def store(self, path, statements):
+        # Everything but the key: the same script with the same options.
+        prefix = os.path.basename(path)[:-len(SUFFIX)].rsplit(".", 1)[0] + "."
+        try:
+            if self.signingKey() is None:
+                return False
+            # Drop artifacts for older versions of the same script.
+            for name in os.listdir(self.directory):
+                if name.startswith(prefix) and name.endswith(SUFFIX):
+                    os.remove(os.path.join(self.directory, name))
+            payload = zlib.compress(pickle.dumps(statements, pickle.HIGHEST_PROTOCOL))
+            data = MAGIC + self.sign(payload) + payload
+            # Write then rename so a concurrent run never sees half a file.
+            temp = f"{path}.{os.getpid()}.tmp"
+            with open(temp, "wb") as f:
+                f.write(data)
+            os.replace(temp, path)
+        except (OSError, RecursionError, pickle.PicklingError):
+            # Caching is best effort, e.g. the disk may be full.
+            return False
+        return True
+
+def clear(paths, directory=None):
+    """Removes cached artifacts for the given scripts, for every .lox script
+    under the given directories, or for every script if paths is empty.
+    Returns how many files were removed.
+    """
+    directory = directory or defaultDirectory()
+    if not os.path.isdir(directory):
+        return 0
+    prefixes = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                prefixes += [scriptPrefix(os.path.join(root, name)) for name in files if name.endswith(".lox")]
+        else:
+            prefixes.append(scriptPrefix(path))
+
+    removed = 0
+    for name in os.listdir(directory):
+        if name.endswith(SUFFIX) and (not paths or name.startswith(tuple(prefixes))):
+            os.remove(os.path.join(directory, name))
+            removed += 1
+    return removed
@@ -0,0 +1,232 @@
+#!/usr/local/bin/python3
+
+from lox_types import TokenType as TT
+from expr import BinaryExpr
+from rope import concatenate
+
+# Quickening for the tree-walking interpreter.
+#
+# A BinaryExpr starts out generic. After its first successful evaluation
+# the interpreter rewrites it in place, by switching its class, into a
+# variant specialized for the operator and the operand types it saw. The
+# variant's evaluate does the operation directly behind a type guard, with
+# no dispatch on the operator and no checkNumberOperands. If the guard ever
+# fails the node falls back to the generic path for good.
+#
+# The variants add no slots, so a node can change class freely, and they
+# only override evaluate, which only the Interpreter calls, for classes
+# with quickened set; every other visitor still sees a BinaryExpr.
+
+class QuickenedBinaryExpr(BinaryExpr):
+    __slots__ = ()
+    quickened = True
+
+    def fallback(self, interpreter, left, right):
+        self.__class__ = PolymorphicBinaryExpr
+        return interpreter.binary(self, left, right)
+
+class PolymorphicBinaryExpr(BinaryExpr):
+    # Saw operands its specialization did not expect; never quickened again.
+    __slots__ = ()
+
+class NumberAddExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left + right
+        return self.fallback(interpreter, left, right)
+
+class NumberSubtractExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left - right
+        return self.fallback(interpreter, left, right)
+
+class NumberMultiplyExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left * right
+        return self.fallback(interpreter, left, right)
+
+class NumberDivideExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left // right
+        return self.fallback(interpreter, left, right)
+
+class NumberLessExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left < right
+        return self.fallback(interpreter, left, right)
+
+class NumberLessEqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left <= right
+        return self.fallback(interpreter, left, right)
+
+class NumberGreaterExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left > right
+        return self.fallback(interpreter, left, right)
+
+class NumberGreaterEqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if type(left) is float and type(right) is float:
+            return left >= right
+        return self.fallback(interpreter, left, right)
+
+class StringConcatExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        # Returns None unless both operands are strings or ropes.
+        string = concatenate(left, right)
+        if string is not None:
+            return string
+        return self.fallback(interpreter, left, right)
+
+# Equality works on any operands, so these only skip the dispatch.
+
+class EqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left is None:
+            return right is None
+        return left == right
+
+class NotEqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        left = interpreter.evaluate(self.left)
+        right = interpreter.evaluate(self.right)
+        if left is None:
+            return right is not None
+        return not left == right
+
+# Variants for nodes TypeInference proved numeric, which need no guard.
+
+class ProvenAddExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) + interpreter.evaluate(self.right)
+
+class ProvenSubtractExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) - interpreter.evaluate(self.right)
+
+class ProvenMultiplyExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) * interpreter.evaluate(self.right)
+
+class ProvenDivideExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) // interpreter.evaluate(self.right)
+
+class ProvenLessExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) < interpreter.evaluate(self.right)
+
+class ProvenLessEqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) <= interpreter.evaluate(self.right)
+
+class ProvenGreaterExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) > interpreter.evaluate(self.right)
+
+class ProvenGreaterEqualExpr(QuickenedBinaryExpr):
+    __slots__ = ()
+
+    def evaluate(self, interpreter):
+        return interpreter.evaluate(self.left) >= interpreter.evaluate(self.right)
+
+PROVEN_VARIANTS = {
+    TT.PLUS: ProvenAddExpr,
+    TT.MINUS: ProvenSubtractExpr,
+    TT.STAR: ProvenMultiplyExpr,
+    TT.SLASH: ProvenDivideExpr,
+    TT.LESS: ProvenLessExpr,
+    TT.LESS_EQUAL: ProvenLessEqualExpr,
+    TT.GREATER: ProvenGreaterExpr,
+    TT.GREATER_EQUAL: ProvenGreaterEqualExpr,
+}
+
+NUMBER_VARIANTS = {
+    TT.PLUS: NumberAddExpr,
+    TT.MINUS: NumberSubtractExpr,
+    TT.STAR: NumberMultiplyExpr,
+    TT.SLASH: NumberDivideExpr,
+    TT.LESS: NumberLessExpr,
+    TT.LESS_EQUAL: NumberLessEqualExpr,
+    TT.GREATER: NumberGreaterExpr,
+    TT.GREATER_EQUAL: NumberGreaterEqualExpr,
+}
+
+def quicken(x, left, right):
+    """Rewrites the generic BinaryExpr x into the variant for the operand
+    values it just evaluated, if there is one.
+    """
+    tt = x.operator.token_type
+    if x.numeric:
+        x.__class__ = PROVEN_VARIANTS[tt]
+    elif tt == TT.EQUAL_EQUAL:
+        x.__class__ = EqualExpr
+    elif tt == TT.BANG_EQUAL:
+        x.__class__ = NotEqualExpr
+    elif type(left) is float and type(right) is float:
+        x.__class__ = NUMBER_VARIANTS[tt]
+    elif tt == TT.PLUS:
+        x.__class__ = StringConcatExpr
@@ -0,0 +1,154 @@
+#!/usr/local/bin/python3
+
+import gc
+import re
+import sys
+
+from token import Token
+from scanner import Scanner, KEYWORDS
+from lox_types import TokenType as TT
+
+# ASCII identifiers and numbers must not run straight into a non-ASCII
+# character, because Scanner's isalpha()/isdigit() tests would treat some of
+# those as part of the lexeme. Such rare spots are left to the Scanner. The
+# lexemes are matched atomically, so a failed check cannot retry with a
+# shorter lexeme: (?=(?P<x>...))(?P=x) matches greedily inside the
+# lookahead, which is never backtracked into, then consumes exactly that.
+# It does what (?>...) does on Pythons older than 3.11.
+NOT_NON_ASCII = r"(?![^\x00-\x7f])"
+
+# Each match is one token together with the whitespace and comments in
+# front of it, so the loop below runs once per token. The skipped prefix is
+# atomic too: backtracking into a comment must never turn it into tokens.
+PATTERN = re.compile(rf"""
+    (?=(?P<_skipped>(?:[ \t\r\n]+|//[^\n]*)*))(?P=_skipped)
+    (?:
+        (?P<IDENTIFIER>(?=(?P<_word>[A-Za-z_][A-Za-z0-9_]*))(?P=_word){NOT_NON_ASCII})
+      | (?P<OPERATOR>!=|==|<=|>=|[(){{}},.\-+;*!=<>/])
+      | (?P<NUMBER>(?=(?P<_digits>[0-9]+(?:\.[0-9]+)?))(?P=_digits){NOT_NON_ASCII}(?!\.[^\x00-\x7f]))
+      | (?P<STRING>"[^"]*")
+      | (?P<OPEN_STRING>"[^"]*\Z)
+      | (?P<END>\Z)
+    )
+""", re.VERBOSE)
+
+# Roughly how many characters of a file are read at a time.
+BLOCK_SIZE = 1 << 16
+
+OPERATORS = {
+    "(": TT.LEFT_PAREN,
+    ")": TT.RIGHT_PAREN,
+    "{": TT.LEFT_BRACE,
+    "}": TT.RIGHT_BRACE,
+    ",": TT.COMMA,
+    ".": TT.DOT,
+    "-": TT.MINUS,
+    "+": TT.PLUS,
+    ";": TT.SEMICOLON,
+    "*": TT.STAR,
+    "/": TT.SLASH,
+    "!": TT.BANG,
+    "!=": TT.BANG_EQUAL,
+    "=": TT.EQUAL,
+    "==": TT.EQUAL_EQUAL,
+    "<": TT.LESS,
+    "<=": TT.LESS_EQUAL,
+    ">": TT.GREATER,
+    ">=": TT.GREATER_EQUAL,
+}
+
+class RegexScanner:
+    """Drop-in replacement for Scanner that tokenizes with one compiled
+    master regex instead of a method call per character.
+
+    It produces exactly the same tokens, lines and errors as Scanner. Any
+    position the regex does not cover (unexpected characters, unterminated
+    strings, non-ASCII text) is handed to a Scanner for that one token.
+    """
+
+    def __init__(self, error_handler, source):
+        self.error_handler = error_handler
+        # Like Scanner, source is a string or a file object. A file is read
+        # in blocks of whole lines, which no token but a string spans.
+        if isinstance(source, str):
+            self.source = source
+            self.reader = None
+        else:
+            self.source = ""
+            self.reader = source
+
+    def scanTokens(self):
+        # Tokens never form reference cycles, so the cyclic collector would
+        # only rescan the growing token list over and over.
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            return list(self.scan())
+        finally:
+            if enabled:
+                gc.enable()
+
+    def read(self):
+        if self.reader is None:
+            return ""
+        block = "".join(self.reader.readlines(BLOCK_SIZE))
+        if not block:
+            self.reader = None
+        return block
+
+    def scan(self):
+        """Yields tokens as they are scanned, ending with EOF."""
+        match = PATTERN.match
+        intern = sys.intern
+        keywords = KEYWORDS
+        IDENTIFIER, NUMBER, STRING = TT.IDENTIFIER, TT.NUMBER, TT.STRING
+        source = self.source + self.read()
+        fallback = None
+        line = 1
+        pos = 0
+
+        while True:
+            m = match(source, pos)
+            kind = m.lastgroup if m else None
+            if kind in ("END", "OPEN_STRING") and self.reader is not None:
+                # The rest of the token may be in the next block.
+                source = source[pos:] + self.read()
+                pos = 0
+                continue
+            if kind is None or kind == "OPEN_STRING":
+                if fallback is None:
+                    fallback = Scanner(self.error_handler, "")
+                fallback.source = source
+                fallback.start = fallback.current = pos
+                fallback.line = line
+                fallback.scanToken()
+                yield from fallback.tokens
+                fallback.tokens.clear()
+                pos = fallback.current
+                line = fallback.line
+                if pos >= len(source):
+                    break
+                continue
+
+            start = m.start(kind)
+            if start != pos:
+                line += source.count("\n", pos, start)
+            pos = m.end()
+            if kind == "IDENTIFIER":
+                text = intern(m[kind])
+                yield Token(keywords.get(text, IDENTIFIER), text, None, line)
+            elif kind == "OPERATOR":
+                text = m[kind]
+                yield Token(OPERATORS[text], text, None, line)
+            elif kind == "NUMBER":
+                text = m[kind]
+                yield Token(NUMBER, text, float(text), line)
+            elif kind == "STRING":
+                # Scanner reports a string on the line it ends on.
+                text = m[kind]
+                line += text.count("\n")
+                yield Token(STRING, text, text[1:-1], line)
+            else:
+                break
+
+        yield Token(TT.EOF, "", None, line)
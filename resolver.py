@@ -6,10 +6,10 @@ from expr import *
 from lox_types import FunctionType as FT, ClassType as CT
 
 class Resolver(Visitor):
-    def __init__(self, error_handler, interpreter):
+    def __init__(self, error_handler):
         self.error_handler = error_handler
-        self.interpreter = interpreter
         self.scopes = []
+        self.slots = []
         self.currentFunction = FT.NONE
         self.currentClass = CT.NONE
 
@@ -25,6 +25,10 @@ class Resolver(Visitor):
         self.currentFunction = function_type
 
         self.beginScope()
+        if function_type in [FT.METHOD, FT.INITIALIZER]:
+            # Methods receive "this" in the first slot of their own frame.
+            self.scopes[-1]["this"] = True
+            self.allocateSlot("this")
         for param in function.params:
             self.declare(param)
             self.define(param)
@@ -35,9 +39,11 @@ class Resolver(Visitor):
 
     def beginScope(self):
         self.scopes.append({})
+        self.slots.append({})
 
     def endScope(self):
         self.scopes.pop()
+        self.slots.pop()
 
     def declare(self, name):
         if len(self.scopes) == 0:
@@ -46,6 +52,14 @@ class Resolver(Visitor):
         if name.lexeme in scope:
             self.error_handler.error(name, "Variable with this name already declared in this scope.")
         scope[name.lexeme] = False
+        self.allocateSlot(name.lexeme)
+
+    def allocateSlot(self, lexeme):
+        # Slots are handed out in declaration order, which is the order the
+        # Interpreter defines the values in at runtime.
+        slots = self.slots[-1]
+        if lexeme not in slots:
+            slots[lexeme] = len(slots)
 
     def define(self, name):
         if len(self.scopes) == 0:
@@ -55,7 +69,8 @@ class Resolver(Visitor):
     def resolveLocal(self, expr, name):
         for i in range(len(self.scopes)-1, -1, -1):
             if name.lexeme in self.scopes[i]:
-                self.interpreter.resolve(expr, len(self.scopes)-1-i)
+                expr.depth = len(self.scopes)-1-i
+                expr.slot = self.slots[i][name.lexeme]
                 return
         # Not found. Assume it is global.
 
@@ -82,9 +97,7 @@ class Resolver(Visitor):
             if x.superclass:
                 self.beginScope()
                 self.scopes[-1]["super"] = True
-
-            self.beginScope()
-            self.scopes[-1]["this"] = True
+                self.allocateSlot("super")
 
             for method in x.methods:
                 declaration = FT.METHOD
@@ -92,12 +105,10 @@ class Resolver(Visitor):
                     declaration = FT.INITIALIZER
                 self.resolveFunction(method, declaration)
 
-            self.endScope()
-
             if x.superclass:
                 self.endScope()
 
-            self.currenttClass = enclosingClass
+            self.currentClass = enclosingClass
         elif isinstance(x, ExpressionStmt):
             self.resolve(x.expression)
         elif isinstance(x, FunctionStmt):
@@ -124,7 +135,7 @@ class Resolver(Visitor):
                 self.resolve(x.initializer)
             self.define(x.name)
         elif isinstance(x, WhileStmt):
-            self.resolve(x.conition)
+            self.resolve(x.condition)
             self.resolve(x.body)
         elif isinstance(x, AssignExpr):
             self.resolve(x.value)
@@ -160,7 +171,7 @@ class Resolver(Visitor):
                 return None
             self.resolveLocal(x, x.keyword)
         elif isinstance(x, UnaryExpr):
-            self.resolve(right)
+            self.resolve(x.right)
         elif isinstance(x, VariableExpr):
             if len(self.scopes) > 0 and x.name.lexeme in self.scopes[-1]:
                 if self.scopes[-1][x.name.lexeme] == False:
@@ -0,0 +1,97 @@
+#!/usr/local/bin/python3
+
+# Strings shorter than this are concatenated directly; copying them is
+# cheaper than building a rope.
+ROPE_THRESHOLD = 256
+
+class Rope:
+    """A Lox string built by concatenation, kept as a list of pieces until
+    its text is needed.
+
+    Ropes are immutable like str, but appending to the most recent rope
+    built on a parts list extends that list in place, so the pieces are
+    shared and s = s + piece in a loop takes amortized linear time.
+    Prepending works the same way on a second list, front, so s = piece + s
+    is linear too. The text is joined once, on the first str(), comparison
+    or hash, and kept.
+    """
+
+    __slots__ = ("parts", "count", "front", "frontCount", "length", "string")
+
+    def __init__(self, parts, length, front=None):
+        self.parts = parts
+        # Only the first count parts belong to this rope; later ones were
+        # appended for ropes built on top of it.
+        self.count = len(parts)
+        # Prepended pieces, the last one first, shared the same way.
+        self.front = front
+        self.frontCount = len(front) if front else 0
+        self.length = length
+        self.string = None
+
+    def append(self, piece):
+        parts = self.parts
+        if len(parts) != self.count:
+            # Another rope already extended the shared list.
+            parts = parts[:self.count]
+        parts.append(piece)
+        rope = Rope(parts, self.length + len(piece), self.front)
+        rope.frontCount = self.frontCount
+        return rope
+
+    def prepend(self, piece):
+        front = self.front
+        if front is None:
+            front = []
+        elif len(front) != self.frontCount:
+            front = front[:self.frontCount]
+        front.append(piece)
+        rope = Rope(self.parts, self.length + len(piece), front)
+        rope.count = self.count
+        return rope
+
+    def __str__(self):
+        if self.string is None:
+            parts = self.parts
+            if len(parts) != self.count:
+                parts = parts[:self.count]
+            if self.frontCount:
+                parts = self.front[:self.frontCount][::-1] + parts
+            self.string = "".join(parts)
+        return self.string
+
+    def __add__(self, other):
+        if type(other) is Rope:
+            other = str(other)
+        return self.append(other)
+
+    def __eq__(self, other):
+        if type(other) is Rope:
+            return str(self) == str(other)
+        return str(self) == other
+
+    def __hash__(self):
+        return hash(str(self))
+
+def concatenate(left, right):
+    """Returns left + right for two Lox strings, either of which may be a
+    Rope, or None if either is not a string.
+    """
+    if type(left) is str:
+        if type(right) is str:
+            length = len(left) + len(right)
+            if length < ROPE_THRESHOLD:
+                return left + right
+            return Rope([left, right], length)
+        if type(right) is Rope:
+            return right.prepend(left)
+        return None
+    if type(left) is Rope and (type(right) is str or type(right) is Rope):
+        return left + right
+    return None
+
+def materialize(value):
+    """Returns value with a Rope replaced by its text."""
+    if type(value) is Rope:
+        return str(value)
+    return value
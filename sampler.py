@@ -0,0 +1,137 @@
+#!/usr/local/bin/python3
+
+import sys
+import threading
+
+from token import Token
+from expr import Expr
+from stmt import Stmt
+from lox_function import LoxFunction
+from closure_interpreter import ClosureFunction
+from vm import VM
+
+# Python code objects that run a Lox call in the tree-walking engines. A
+# Python frame running one of them is a Lox frame.
+CALL_CODES = {LoxFunction.execute.__code__, ClosureFunction.execute.__code__}
+VM_RUN_CODE = VM.run.__code__
+
+def lineOf(value, depth=0):
+    """Returns the line of the first token in or under value, or None."""
+    if isinstance(value, Token):
+        return value.line
+    if not isinstance(value, (Expr, Stmt)) or depth > 3:
+        return None
+    # Quickened nodes are subclasses that add no slots of their own.
+    children = [getattr(value, name) for klass in type(value).__mro__
+                for name in klass.__dict__.get("__slots__", ())]
+    # Prefer the node's own tokens over those of its subexpressions.
+    for child in children:
+        if isinstance(child, Token):
+            return child.line
+    for child in children:
+        if isinstance(child, list):
+            child = child[0] if child else None
+        line = lineOf(child, depth+1)
+        if line is not None:
+            return line
+    return None
+
+class Sampler:
+    """Samples which Lox line is running and the Lox call stack above it.
+
+    A timer thread wakes every interval seconds and inspects the Python
+    stack of the thread that called start(), so nothing is added to the
+    interpreter's own hot paths. The tree-walking engines are sampled from
+    the AST nodes and tokens in their Python frames, the VM from its call
+    frames and instruction pointer.
+
+        sampler = Sampler(lox.interpreter)
+        with sampler:
+            lox.run(source)
+        print(sampler.report())
+    """
+
+    def __init__(self, interpreter, interval=0.005):
+        self.interpreter = interpreter
+        self.interval = interval
+        self.lines = {}
+        self.paths = {}
+        self.samples = 0
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        self.target = threading.get_ident()
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+
+    def loop(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.target)
+            if frame is not None:
+                self.sample(frame)
+
+    def sample(self, frame):
+        if isinstance(self.interpreter, VM):
+            line, functions = self.sampleVM(frame)
+        else:
+            line, functions = self.sampleTree(frame)
+        if line is None:
+            return
+
+        self.samples += 1
+        self.lines[line] = self.lines.get(line, 0) + 1
+        path = ";".join(["<script>"] + functions)
+        self.paths[path] = self.paths.get(path, 0) + 1
+
+    def sampleTree(self, frame):
+        line = None
+        functions = []
+        while frame is not None:
+            if frame.f_code in CALL_CODES:
+                name = frame.f_locals["self"].declaration.name
+                functions.append(f"{name.lexeme}:{name.line}")
+            elif line is None:
+                for value in frame.f_locals.values():
+                    line = lineOf(value)
+                    if line is not None:
+                        break
+            frame = frame.f_back
+        functions.reverse()
+        return line, functions
+
+    def sampleVM(self, frame):
+        while frame is not None and frame.f_code is not VM_RUN_CODE:
+            frame = frame.f_back
+        if frame is None:
+            return None, []
+        run = frame.f_locals
+        line = run["lines"][max(run["ip"]-1, 0)]
+        # The outermost frame is the script itself.
+        functions = [f.closure.function.name for f in self.interpreter.frames[1:]]
+        return line, functions
+
+    def report(self, limit=10):
+        total = max(self.samples, 1)
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms",
+                 "", f"{'samples':>8} {'%':>6}  line"]
+        for line, count in sorted(self.lines.items(), key=lambda item: -item[1])[:limit]:
+            lines.append(f"{count:>8} {count * 100 / total:>5.1f}%  {line}")
+        lines += ["", f"{'samples':>8} {'%':>6}  call path"]
+        for path, count in sorted(self.paths.items(), key=lambda item: -item[1])[:limit]:
+            lines.append(f"{count:>8} {count * 100 / total:>5.1f}%  {path}")
+        return "\n".join(lines)
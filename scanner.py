@@ -1,46 +1,65 @@
 #!/usr/local/bin/python3
 
+import sys
+
 from token import Token
 from lox_types import TokenType as TT
 
+KEYWORDS = {
+    "and": TT.AND,
+    "class": TT.CLASS,
+    "else": TT.ELSE,
+    "false": TT.FALSE,
+    "for": TT.FOR,
+    "fun": TT.FUN,
+    "if": TT.IF,
+    "nil": TT.NIL,
+    "or": TT.OR,
+    "print": TT.PRINT,
+    "return": TT.RETURN,
+    "super": TT.SUPER,
+    "this": TT.THIS,
+    "true": TT.TRUE,
+    "var": TT.VAR,
+    "while": TT.WHILE
+}
+
 class Scanner:
     def __init__(self, error_handler, source):
         self.error_handler = error_handler
 
-        self.source = source
+        # Source is a string or a file object. A file is read one line at a
+        # time, and only the line being scanned is kept in self.source (a
+        # string token may make it span several lines).
+        if isinstance(source, str):
+            self.source = source
+            self.reader = None
+        else:
+            self.source = ""
+            self.reader = source
         self.tokens = []
 
         self.start = 0
         self.current = 0
         self.line = 1
 
-        self.keywords = {
-            "and": TT.AND,
-            "class": TT.CLASS,
-            "else": TT.ELSE,
-            "false": TT.FALSE,
-            "for": TT.FOR,
-            "fun": TT.FUN,
-            "if": TT.IF,
-            "nil": TT.NIL,
-            "or": TT.OR,
-            "print": TT.PRINT,
-            "return": TT.RETURN,
-            "super": TT.SUPER,
-            "this": TT.THIS,
-            "true": TT.TRUE,
-            "var": TT.VAR,
-            "while": TT.WHILE
-        }
+        self.keywords = KEYWORDS
 
     def scanTokens(self):
+        return list(self.scan())
+
+    def scan(self):
+        """Yields tokens as they are scanned, ending with EOF."""
+        tokens = self.tokens
         while not self.isAtEnd():
             # We are at the beginning of the next lexeme.
             self.start = self.current
             self.scanToken()
+            if tokens:
+                yield from tokens
+                tokens.clear()
 
-        self.tokens.append(Token(TT.EOF, "", None, self.line))
-        return self.tokens
+        yield Token(TT.EOF, "", None, self.line)
 
     def scanToken(self):
         c = self.advance()
@@ -97,13 +116,15 @@ class Scanner:
     def identifier(self):
         while self.isAlphaNumeric(self.peek()):
             self.advance()
-        text = self.source[self.start:self.current]
+        # Names are interned so that every use of a name shares one string
+        # and dict lookups by name compare by identity.
+        text = sys.intern(self.source[self.start:self.current])
         token_type = None
         if text in self.keywords:
             token_type = self.keywords[text]
         if not token_type:
             token_type = TT.IDENTIFIER
-        self.addToken(token_type)
+        self.tokens.append(Token(token_type, text, None, self.line))
 
     def number(self):
         while self.isDigit(self.peek()):
@@ -165,7 +186,20 @@ class Scanner:
         return c.isdigit()
 
     def isAtEnd(self):
-        return self.current >= len(self.source)
+        return self.current >= len(self.source) and not self.refill()
+
+    def refill(self):
+        if self.reader is None:
+            return False
+        line = self.reader.readline()
+        if not line:
+            self.reader = None
+            return False
+        # Keep the current lexeme, which may be an unfinished string.
+        self.source = self.source[self.start:] + line
+        self.current -= self.start
+        self.start = 0
+        return True
 
     def advance(self):
         self.current += 1
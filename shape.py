@@ -0,0 +1,35 @@
+#!/usr/local/bin/python3
+
+class Shape:
+    """The layout of a LoxInstance's fields: which index of the instance's
+    values list holds each field.
+
+    Every class has an empty root shape. Adding a field moves an instance to
+    the child shape for that name, and instances of a class that gain the
+    same fields in the same order end up sharing one shape. Shapes never
+    change once created, so a shape seen before gives the same indexes.
+    """
+
+    __slots__ = ("klass", "indexes", "transitions")
+
+    def __init__(self, klass, indexes):
+        self.klass = klass
+        self.indexes = indexes
+        self.transitions = {}
+
+    def store(self, name):
+        """Returns the index a value for name goes to and the shape the
+        instance has afterwards, which is a new child when name is not yet a
+        field.
+        """
+        index = self.indexes.get(name)
+        if index is not None:
+            return index, self
+
+        shape = self.transitions.get(name)
+        if shape is None:
+            indexes = dict(self.indexes)
+            indexes[name] = len(indexes)
+            shape = Shape(self.klass, indexes)
+            self.transitions[name] = shape
+        return len(self.indexes), shape
@@ -0,0 +1,134 @@
+#!/usr/local/bin/python3
+
+from expr import BinaryExpr, GetExpr, SuperExpr
+from stmt import ClassStmt, FunctionStmt, ReturnStmt
+from environment import Environment
+from interpreter import Interpreter
+from closure_interpreter import ClosureInterpreter
+from lox_function import LoxFunction
+from native import NativeMethod
+
+# Runtime statistics (--stats).
+#
+# Counting is done by the Counting* engines below, which override the
+# dispatch points of the normal engines. The normal engines carry no
+# counting code, so statistics cost nothing unless they are switched on.
+# Only instance allocation is reported from LoxClass.call, which checks
+# interpreter.stats.
+
+class RuntimeStats:
+    def __init__(self):
+        self.nodes = {}
+        self.environments = 0
+        self.functions = 0
+        self.instances = 0
+        self.boundMethods = 0
+        self.peakDepth = 0
+
+    def node(self, x, value):
+        kind = type(x)
+        if isinstance(x, BinaryExpr):
+            # Count quickened variants as the node they started out as.
+            kind = BinaryExpr
+        self.nodes[kind] = self.nodes.get(kind, 0) + 1
+        if kind is FunctionStmt:
+            self.functions += 1
+        elif kind is ClassStmt:
+            self.functions += len(x.methods)
+            if x.superclass:
+                # The environment binding "super" for the methods.
+                self.environments += 1
+        elif kind is GetExpr or kind is SuperExpr:
+            # A method read off an instance, rather than a field that holds
+            # a function, is bound on the spot. Native methods of List and
+            # Map are bound the same way.
+            if (isinstance(value, (LoxFunction, NativeMethod)) and value.receiver is not None and
+                    (kind is SuperExpr or x.name.lexeme not in value.receiver.shape.indexes)):
+                self.functions += 1
+                self.boundMethods += 1
+
+    def environment(self, environment):
+        self.environments += 1
+        depth = 0
+        while isinstance(environment, Environment):
+            depth += 1
+            environment = environment.enclosing
+        if depth > self.peakDepth:
+            self.peakDepth = depth
+
+    def counters(self):
+        """Returns every counter by name, for reading programmatically."""
+        counters = {f"nodes.{kind.__name__}": count for kind, count in self.nodes.items()}
+        counters.update({
+            "nodes": sum(self.nodes.values()),
+            "environments": self.environments,
+            "functions": self.functions,
+            "instances": self.instances,
+            "boundMethods": self.boundMethods,
+            # Returns unwind as completion values, so none of them raise.
+            "returns": self.nodes.get(ReturnStmt, 0),
+            "returnExceptions": 0,
+            "peakDepth": self.peakDepth,
+        })
+        return counters
+
+    def report(self):
+        counters = self.counters()
+        lines = []
+        for name in ["nodes", "environments", "functions", "instances", "boundMethods",
+                     "returns", "returnExceptions", "peakDepth"]:
+            lines.append(f"{name:<24} {counters[name]:>12}")
+        for kind, count in sorted(self.nodes.items(), key=lambda item: -item[1]):
+            lines.append(f"  {kind.__name__:<22} {count:>12}")
+        return "\n".join(lines)
+
+class CountingInterpreter(Interpreter):
+    def __init__(self, error_handler):
+        super().__init__(error_handler)
+        self.stats = RuntimeStats()
+
+    def evaluate(self, expr):
+        value = expr.evaluate(self) if expr.quickened else self.visit(expr)
+        self.stats.node(expr, value)
+        return value
+
+    def execute(self, stmt):
+        completion = stmt.accept(self)
+        self.stats.node(stmt, None)
+        return completion
+
+    def executeBlock(self, statements, environment):
+        # Every block and every call body gets a fresh environment.
+        self.stats.environment(environment)
+        return super().executeBlock(statements, environment)
+
+class CountingClosureInterpreter(ClosureInterpreter):
+    def __init__(self, error_handler):
+        super().__init__(error_handler)
+        self.stats = RuntimeStats()
+
+    def compile(self, node):
+        code = super().compile(node)
+        stats = self.stats
+
+        def counted(env):
+            value = code(env)
+            stats.node(node, value)
+            return value
+        return counted
+
+    def compileStatements(self, statements):
+        # Compiled statement lists run block and call bodies, each in a
+        # fresh environment.
+        code = super().compileStatements(statements)
+        stats = self.stats
+
+        def counted(env):
+            stats.environment(env)
+            return code(env)
+        return counted
+
+COUNTING_ENGINES = {
+    "tree": CountingInterpreter,
+    "closure": CountingClosureInterpreter,
+}
@@ -1,50 +1,63 @@
 #!/usr/local/bin/python3
 
 class Stmt:
+    __slots__ = ()
+
     def accept(self, visitor):
         return visitor.visit(self)
 
 class BlockStmt(Stmt):
+    __slots__ = ("statements",)
     def __init__(self, statements):
         self.statements = statements
 
 class ClassStmt(Stmt):
+    __slots__ = ("name", "superclass", "methods")
     def __init__(self, name, superclass, methods):
         self.name = name
         self.superclass = superclass
         self.methods = methods
 
 class ExpressionStmt(Stmt):
+    __slots__ = ("expression",)
     def __init__(self, expression):
         self.expression = expression
 
 class IfStmt(Stmt):
+    __slots__ = ("condition", "thenBranch", "elseBranch")
     def __init__(self, condition, thenBranch, elseBranch):
         self.condition = condition
         self.thenBranch = thenBranch
         self.elseBranch = elseBranch
 
 class FunctionStmt(Stmt):
+    __slots__ = ("name", "params", "body", "compiled")
     def __init__(self, name, params, body):
         self.name = name
         self.params = params
         self.body = body
+        # The Python function the JIT compiled the body to, once it is hot.
+        self.compiled = None
 
 class PrintStmt(Stmt):
+    __slots__ = ("expression",)
     def __init__(self, expression):
         self.expression = expression
 
 class ReturnStmt(Stmt):
+    __slots__ = ("keyword", "value")
     def __init__(self, keyword, value):
         self.keyword = keyword
         self.value = value
 
 class VariableStmt(Stmt):
+    __slots__ = ("name", "initializer")
     def __init__(self, name, initializer):
         self.name = name
         self.initializer = initializer
 
 class WhileStmt(Stmt):
+    __slots__ = ("condition", "body")
     def __init__(self, condition, body):
         self.condition = condition
         self.body = body
@@ -0,0 +1,42 @@
+#!/usr/local/bin/python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Runs lox.py in a subprocess: the repo's token.py shadows the stdlib
+# module, which the test runner has already imported.
+LOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lox.py")
+ENGINES = ("tree", "closure", "vm")
+
+def run(source, engine):
+    with tempfile.NamedTemporaryFile("w", suffix=".lox", delete=False) as f:
+        f.write(source)
+    try:
+        result = subprocess.run([sys.executable, LOX, f"--engine={engine}", f.name],
+                                capture_output=True, text=True)
+    finally:
+        os.unlink(f.name)
+    return result.stdout
+
+class ListIndexTest(unittest.TestCase):
+    def testNonFiniteIndices(self):
+        calls = []
+        for index in ('num("nan")', 'num("inf")', 'num("-inf")'):
+            calls += [f"get({index})", f"set({index}, 2)", f"insert({index}, 2)", f"remove({index})"]
+        for engine in ENGINES:
+            for call in calls:
+                with self.subTest(engine=engine, call=call):
+                    source = f"var l = List();\nl.append(1);\nl.{call};\n"
+                    self.assertEqual(run(source, engine), "Index must be a finite number.\n[line 3]\n")
+
+    def testIndices(self):
+        source = "var l = List();\nl.append(1);\nl.insert(0, 2);\nprint l.get(1);\nprint l.get(2);\n"
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, engine), "1.0\nIndex out of range.\n[line 5]\n")
+
+if __name__ == "__main__":
+    unittest.main()
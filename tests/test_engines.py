@@ -0,0 +1,185 @@
+#!/usr/local/bin/python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Runs lox.py in a subprocess: the repo's token.py shadows the stdlib
+# module, which the test runner has already imported.
+LOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lox.py")
+ENGINES = ("tree", "closure", "vm")
+# Every engine, with and without the optimizer, and the tree engine's JIT.
+CONFIGURATIONS = [(f"--engine={engine}",) for engine in ENGINES]
+CONFIGURATIONS += [flags + ("-O",) for flags in CONFIGURATIONS]
+CONFIGURATIONS += [("--jit",), ("--jit", "-O")]
+
+def run(source, *flags):
+    with tempfile.NamedTemporaryFile("w", suffix=".lox", delete=False) as f:
+        f.write(source)
+    try:
+        result = subprocess.run([sys.executable, LOX, *flags, f.name], capture_output=True, text=True)
+    finally:
+        os.unlink(f.name)
+    return result.stdout, result.returncode
+
+# The receiver is checked and the method looked up before the arguments
+# are evaluated.
+NIL_RECEIVER = """
+fun side() { print "side"; return 1; }
+var x = nil;
+x.foo(side());
+"""
+
+UNDEFINED_METHOD = """
+class A {}
+fun side() { print "side"; return 1; }
+A().foo(side());
+"""
+
+FIELD_CALL = """
+class O {}
+fun fa(x) { return "a"; }
+fun fb(x) { return "b"; }
+var o = O();
+o.f = fa;
+print o.f(o.f = fb);
+print o.f(1);
+"""
+
+UNDEFINED_SUPER_METHOD = """
+class A {}
+class B < A { m() { return super.foo(side()); } }
+fun side() { print "side"; return 1; }
+B().m();
+"""
+
+class InvokeOrderTest(unittest.TestCase):
+    def check(self, source, expected):
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run(source, f"--engine={engine}"), expected)
+
+    def testNilReceiver(self):
+        self.check(NIL_RECEIVER, ("Only instances have properties.\n[line 4]\n", 1))
+
+    def testUndefinedMethod(self):
+        self.check(UNDEFINED_METHOD, ("Undefined property 'foo'\n[line 4]\n", 1))
+
+    def testFieldCall(self):
+        self.check(FIELD_CALL, ("a\nb\n", 0))
+
+    def testUndefinedSuperMethod(self):
+        self.check(UNDEFINED_SUPER_METHOD, ("Undefined property 'foo'.\n[line 3]\n", 1))
+
+# Each program calls its functions often enough for the JIT to compile
+# them, and exercises one area the engines implement separately.
+PROGRAMS = {
+    "closures": """
+fun counter() {
+  var n = 0;
+  fun inc() { n = n + 1; return n; }
+  return inc;
+}
+var c = counter();
+var d = counter();
+for (var i = 0; i < 200; i = i + 1) c();
+print c();
+print d();
+fun adder(x) { fun add(y) { return x + y; } return add; }
+print adder(2)(3);
+""",
+    "classes": """
+class A {
+  init(x) { this.x = x; if (x < 0) return; this.y = 1; }
+  get() { return this.x; }
+  name() { return "A"; }
+}
+class B < A {
+  init(x) { super.init(x * 2); }
+  name() { return "B" + super.name(); }
+}
+var total = 0;
+for (var i = 0; i < 200; i = i + 1) total = total + B(i).get();
+print total;
+print B(1).name();
+var m = B(3).name;
+print m();
+print A(-1).x;
+print A(-1).init(5).x;
+print B;
+print B(1);
+""",
+    "returns": """
+fun find(limit) {
+  var i = 0;
+  while (true) {
+    { if (i * i > limit) return i; }
+    i = i + 1;
+  }
+}
+fun early(x) { if (x) { return "yes"; } else { return; } }
+var r;
+for (var i = 0; i < 200; i = i + 1) r = find(i);
+print r;
+print early(true);
+print early(false);
+fun count(n, acc) { if (n == 0) return acc; return count(n - 1, acc + 1); }
+print count(50, 0);
+""",
+    "operators": """
+fun mix(a, b) { return a + b; }
+var out;
+for (var i = 0; i < 200; i = i + 1) out = mix(i, 1);
+print out;
+print mix("a", "b");
+print 7 / 2;
+print -(3 - 5) * 2 == 4;
+print !nil and 1 or 2;
+print nil == false;
+print "x" != "y";
+print 1 + 2 * 3 - 4;
+var s = 0;
+for (var i = 0; i < 10; i = i + 1) { var sq = i * i; s = s + sq; }
+print s;
+""",
+    "natives": """
+var l = List();
+for (var i = 0; i < 200; i = i + 1) l.append(i);
+print l.length();
+print l.get(199);
+var m = Map();
+m.set("a", 1);
+m.set(true, 2);
+print m.get("a") + m.get(true);
+print len(substring("hello", 1, 3));
+print upper("lox") + str(floor(2.5));
+var text = "";
+for (var i = 0; i < 300; i = i + 1) text = text + "ab";
+print len(text);
+print text == text + "";
+""",
+    "runtime error": """
+fun f(x) { return x - 1; }
+for (var i = 0; i < 200; i = i + 1) f(i);
+print "before";
+print f("s");
+print "after";
+""",
+}
+
+class CrossEngineTest(unittest.TestCase):
+    def testSameOutputEverywhere(self):
+        for name, source in PROGRAMS.items():
+            expected = run(source, "--engine=tree")
+            for flags in CONFIGURATIONS:
+                with self.subTest(program=name, flags=" ".join(flags)):
+                    self.assertEqual(run(source, *flags), expected)
+
+    def testRuntimeErrorExitCode(self):
+        self.assertEqual(run(PROGRAMS["runtime error"], "--engine=tree"),
+                         ("before\nOperands must be numbers.\n[line 2]\n", 1))
+
+if __name__ == "__main__":
+    unittest.main()
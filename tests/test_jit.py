@@ -0,0 +1,54 @@
+#!/usr/local/bin/python3
+
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Runs lox.py in a subprocess: the repo's token.py shadows the stdlib
+# module, which the test runner has already imported.
+LOX = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "lox.py")
+
+def run(source, *flags):
+    with tempfile.NamedTemporaryFile("w", suffix=".lox", delete=False) as f:
+        f.write(source)
+    try:
+        result = subprocess.run([sys.executable, LOX, *flags, f.name], capture_output=True, text=True)
+    finally:
+        os.unlink(f.name)
+    return result.stdout, result.returncode
+
+# Each program calls its function until it is compiled, then once more.
+FIELD_CALL = """
+class O {}
+fun fa(x) { return "a"; }
+fun fb(x) { return "b"; }
+fun t(o) { return o.f(o.f = fb); }
+var o = O();
+var r;
+for (var i = 0; i < 300; i = i + 1) { o.f = fa; r = t(o); }
+print r;
+"""
+
+RECEIVER_CHECK = """
+class B { m(x) { return x; } }
+var quiet = true;
+fun side() { if (!quiet) print "side"; return 1; }
+fun call(b) { return b.m(side()); }
+for (var i = 0; i < 300; i = i + 1) call(B());
+quiet = false;
+call(nil);
+"""
+
+class InvokeOrderTest(unittest.TestCase):
+    def testFieldLookedUpBeforeArguments(self):
+        self.assertEqual(run(FIELD_CALL, "--jit"), ("a\n", 0))
+        self.assertEqual(run(FIELD_CALL, "--jit"), run(FIELD_CALL))
+
+    def testReceiverCheckedBeforeArguments(self):
+        self.assertEqual(run(RECEIVER_CHECK, "--jit"), ("Only instances have properties.\n[line 5]\n", 1))
+        self.assertEqual(run(RECEIVER_CHECK, "--jit"), run(RECEIVER_CHECK))
+
+if __name__ == "__main__":
+    unittest.main()
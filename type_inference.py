@@ -0,0 +1,216 @@
+#!/usr/local/bin/python3
+
+from visitor import Visitor
+from expr import *
+from stmt import *
+from lox_types import TokenType as TT
+from optimizer import children
+
+NUMBER = "number"
+STRING = "string"
+BOOLEAN = "boolean"
+NIL = "nil"
+
+# Operators that check their operands are numbers at runtime.
+CHECKED_BINARY = {TT.MINUS, TT.STAR, TT.SLASH, TT.PLUS,
+                  TT.LESS, TT.LESS_EQUAL, TT.GREATER, TT.GREATER_EQUAL}
+ARITHMETIC = {TT.MINUS, TT.STAR, TT.SLASH}
+COMPARISON = {TT.LESS, TT.LESS_EQUAL, TT.GREATER, TT.GREATER_EQUAL,
+              TT.EQUAL_EQUAL, TT.BANG_EQUAL}
+
+class Variable:
+    __slots__ = ("name", "kind", "assignments", "numeric", "reason")
+
+    def __init__(self, name, kind):
+        self.name = name
+        # "variable", "parameter", "function", "class", "this" or "super".
+        self.kind = kind
+        # (value, line) for the initializer and every assignment.
+        self.assignments = []
+        self.numeric = False
+        self.reason = f"'{name}' is a {kind}"
+
+class TypeInference(Visitor):
+    """Proves which arithmetic and comparison operands are always numbers,
+    so the engines can skip checking them.
+
+    Runs on the resolved AST. A local variable is a number if its
+    initializer and every assignment to it, wherever it is made, produce a
+    number. Variables are assumed to be numbers until an assignment shows
+    otherwise, and the assignments are rechecked until nothing changes.
+    Parameters, globals, fields and call results are never known.
+
+    Every BinaryExpr and UnaryExpr whose operands are proven numbers has
+    numeric set. report() lists the operations that stay checked and why.
+    """
+
+    def __init__(self):
+        # Mirrors the Resolver's scopes: each is a list of Variables by slot.
+        self.scopes = []
+        self.variables = []
+        self.references = {}
+        self.operations = []
+        self.checked = []
+        self.proven = 0
+
+    def infer(self, statements):
+        for statement in statements:
+            statement.accept(self)
+
+        candidates = [v for v in self.variables if v.kind == "variable" and v.assignments]
+        for variable in candidates:
+            variable.numeric = True
+        changed = True
+        while changed:
+            changed = False
+            for variable in candidates:
+                if variable.numeric and not self.allNumbers(variable):
+                    variable.numeric = False
+                    changed = True
+
+        for x in self.operations:
+            self.mark(x)
+
+    def allNumbers(self, variable):
+        for value, line in variable.assignments:
+            if value is None:
+                variable.reason = f"'{variable.name}' is declared without a value"
+                return False
+            if self.typeOf(value)[0] != NUMBER:
+                variable.reason = f"'{variable.name}' is assigned a non-number on line {line}"
+                return False
+        return True
+
+    def mark(self, x):
+        if isinstance(x, UnaryExpr):
+            operands = [("", x.right)]
+        else:
+            operands = [("left ", x.left), ("right ", x.right)]
+
+        for side, operand in operands:
+            kind, reason = self.typeOf(operand)
+            if kind != NUMBER:
+                self.checked.append((x.operator.line, x.operator.lexeme, f"{side}operand {reason}"))
+                return
+        x.numeric = True
+        self.proven += 1
+
+    def typeOf(self, x):
+        """Returns the type x always evaluates to, or None and the reason
+        it is not known.
+        """
+        if isinstance(x, LiteralExpr):
+            if x.value is None:
+                return NIL, "is nil"
+            if isinstance(x.value, bool):
+                return BOOLEAN, "is a boolean"
+            if isinstance(x.value, float):
+                return NUMBER, None
+            return STRING, "is a string"
+        elif isinstance(x, GroupingExpr):
+            return self.typeOf(x.expression)
+        elif isinstance(x, AssignExpr):
+            return self.typeOf(x.value)
+        elif isinstance(x, VariableExpr):
+            if x.depth is None:
+                return None, f"'{x.name.lexeme}' is a global"
+            variable = self.references[x]
+            if variable.numeric:
+                return NUMBER, None
+            return None, variable.reason
+        elif isinstance(x, BinaryExpr):
+            tt = x.operator.token_type
+            # These fail unless their result is a number.
+            if tt in ARITHMETIC:
+                return NUMBER, None
+            if tt in COMPARISON:
+                return BOOLEAN, "is a comparison"
+            left, right = self.typeOf(x.left)[0], self.typeOf(x.right)[0]
+            if left == right == NUMBER:
+                return NUMBER, None
+            if left == right == STRING:
+                return STRING, "is a string"
+            return None, "is a '+' of unknown operands"
+        elif isinstance(x, UnaryExpr):
+            if x.operator.token_type == TT.MINUS:
+                return NUMBER, None
+            return BOOLEAN, "is a boolean"
+        elif isinstance(x, LogicalExpr):
+            left, reason = self.typeOf(x.left)
+            if left is not None and self.typeOf(x.right)[0] == left:
+                return left, reason
+            return None, f"is an '{x.operator.lexeme}' of mixed operands"
+        elif isinstance(x, CallExpr):
+            return None, "is a call result"
+        elif isinstance(x, (GetExpr, SetExpr)):
+            return None, "is a property"
+        return None, f"is '{x.keyword.lexeme}'"
+
+    def report(self):
+        total = self.proven + len(self.checked)
+        lines = [f"Type inference: {self.proven} of {total} checked operations proven numeric."]
+        for line, operator, reason in sorted(self.checked):
+            lines.append(f"[line {line}] '{operator}' stays checked: {reason}")
+        return "\n".join(lines)
+
+    def declare(self, name, kind):
+        # Globals are late bound and never resolved to slots.
+        if not self.scopes:
+            return None
+        variable = Variable(name, kind)
+        self.scopes[-1].append(variable)
+        self.variables.append(variable)
+        return variable
+
+    def function(self, x, isMethod):
+        self.scopes.append([])
+        if isMethod:
+            self.declare("this", "this")
+        for param in x.params:
+            self.declare(param.lexeme, "parameter")
+        for statement in x.body:
+            statement.accept(self)
+        self.scopes.pop()
+
+    def visit(self, x):
+        if isinstance(x, BlockStmt):
+            self.scopes.append([])
+            for statement in x.statements:
+                statement.accept(self)
+            self.scopes.pop()
+        elif isinstance(x, ClassStmt):
+            self.declare(x.name.lexeme, "class")
+            if x.superclass:
+                x.superclass.accept(self)
+                self.scopes.append([])
+                self.declare("super", "super")
+            for method in x.methods:
+                self.function(method, True)
+            if x.superclass:
+                self.scopes.pop()
+        elif isinstance(x, FunctionStmt):
+            self.declare(x.name.lexeme, "function")
+            self.function(x, False)
+        elif isinstance(x, VariableStmt):
+            variable = self.declare(x.name.lexeme, "variable")
+            if x.initializer:
+                x.initializer.accept(self)
+            if variable:
+                # A missing initializer assigns nil, recorded as None.
+                variable.assignments.append((x.initializer, x.name.line))
+        elif isinstance(x, AssignExpr):
+            x.value.accept(self)
+            if x.depth is not None:
+                variable = self.scopes[-1-x.depth][x.slot]
+                variable.assignments.append((x.value, x.name.line))
+        elif isinstance(x, VariableExpr):
+            if x.depth is not None:
+                self.references[x] = self.scopes[-1-x.depth][x.slot]
+        else:
+            if isinstance(x, BinaryExpr) and x.operator.token_type in CHECKED_BINARY:
+                self.operations.append(x)
+            elif isinstance(x, UnaryExpr) and x.operator.token_type == TT.MINUS:
+                self.operations.append(x)
+            for child in children(x):
+                child.accept(self)
+        return None
@@ -0,0 +1,492 @@
+#!/usr/local/bin/python3
+
+from token import Token
+from chunk import OpCode as OP
+from compiler import Compiler
+from environment import GlobalEnvironment
+from vm_function import VMClosure, VMBoundMethod, Upvalue
+from lox_callable import LoxCallable
+from lox_class import LoxClass
+from lox_instance import LoxInstance
+from error_handler import LoxRuntimeException
+from native import NativeFunction, NativeMethod, NativeError, defineNatives
+from lox_builtins import BUILTINS
+from rope import concatenate
+from lox_collections import COLLECTIONS
+
+# Default limit on the number of Lox call frames.
+FRAMES_MAX = 10000
+
+# Plain ints so the dispatch loop compares ints rather than enum members.
+CONSTANT = int(OP.CONSTANT)
+NIL = int(OP.NIL)
+TRUE = int(OP.TRUE)
+FALSE = int(OP.FALSE)
+POP = int(OP.POP)
+GET_LOCAL = int(OP.GET_LOCAL)
+SET_LOCAL = int(OP.SET_LOCAL)
+GET_GLOBAL = int(OP.GET_GLOBAL)
+DEFINE_GLOBAL = int(OP.DEFINE_GLOBAL)
+SET_GLOBAL = int(OP.SET_GLOBAL)
+GET_UPVALUE = int(OP.GET_UPVALUE)
+SET_UPVALUE = int(OP.SET_UPVALUE)
+GET_PROPERTY = int(OP.GET_PROPERTY)
+SET_PROPERTY = int(OP.SET_PROPERTY)
+GET_SUPER = int(OP.GET_SUPER)
+GET_METHOD = int(OP.GET_METHOD)
+GET_SUPER_METHOD = int(OP.GET_SUPER_METHOD)
+EQUAL = int(OP.EQUAL)
+NOT_EQUAL = int(OP.NOT_EQUAL)
+GREATER = int(OP.GREATER)
+GREATER_EQUAL = int(OP.GREATER_EQUAL)
+LESS = int(OP.LESS)
+LESS_EQUAL = int(OP.LESS_EQUAL)
+ADD = int(OP.ADD)
+SUBTRACT = int(OP.SUBTRACT)
+MULTIPLY = int(OP.MULTIPLY)
+DIVIDE = int(OP.DIVIDE)
+NOT = int(OP.NOT)
+NEGATE = int(OP.NEGATE)
+PRINT = int(OP.PRINT)
+JUMP = int(OP.JUMP)
+JUMP_IF_FALSE = int(OP.JUMP_IF_FALSE)
+LOOP = int(OP.LOOP)
+CALL = int(OP.CALL)
+INVOKE = int(OP.INVOKE)
+TAIL_CALL = int(OP.TAIL_CALL)
+TAIL_INVOKE = int(OP.TAIL_INVOKE)
+CLOSURE = int(OP.CLOSURE)
+CLOSE_UPVALUE = int(OP.CLOSE_UPVALUE)
+RETURN = int(OP.RETURN)
+CLASS = int(OP.CLASS)
+INHERIT = int(OP.INHERIT)
+METHOD = int(OP.METHOD)
+
+def isNumbers(a, b):
+    # Mirrors Interpreter.checkNumberOperands.
+    if isinstance(a, int) and isinstance(b, int):
+        return True
+    return isinstance(a, float) and isinstance(b, float)
+
+class CallFrame:
+    def __init__(self, closure, base):
+        self.closure = closure
+        self.ip = 0
+        self.base = base
+
+class VM:
+    """Stack-based virtual machine executing code produced by Compiler.
+
+    Lox calls never recurse in Python: call frames live on an explicit list
+    capped at maxFrames, past which the VM reports "Stack overflow.", and
+    calls in return position reuse the caller's frame.
+    """
+
+    def __init__(self, error_handler, maxFrames=FRAMES_MAX):
+        self.error_handler = error_handler
+        self.maxFrames = maxFrames
+        self.globals = GlobalEnvironment()
+        self.stack = []
+        self.frames = []
+        self.openUpvalues = {}
+        # Profiling and statistics are only implemented by the tree-walking
+        # engines.
+        self.profiler = None
+        self.stats = None
+        defineNatives(self.globals, BUILTINS)
+        for klass in COLLECTIONS:
+            self.globals.define(klass.name, klass)
+
+    def defineNative(self, name, arity, function):
+        """Makes the Python function callable from Lox as the global name."""
+        self.globals.define(name, NativeFunction(name, arity, function))
+
+    def compile(self, statements):
+        return Compiler().compile(statements)
+
+    def interpret(self, statements):
+        script = VMClosure(self.compile(statements), [])
+        try:
+            self.callFunction(script, script, [])
+        except LoxRuntimeException as e:
+            del self.stack[:]
+            del self.frames[:]
+            self.openUpvalues.clear()
+            self.error_handler.runtimeError(e)
+
+    def callFunction(self, closure, receiver, arguments):
+        """Runs closure to completion and returns its result.
+
+        Used for the top-level script and whenever host code calls back into
+        Lox, e.g. LoxClass.call running an initializer.
+        """
+        self.stack.append(receiver)
+        self.stack.extend(arguments)
+        depth = len(self.frames)
+        self.pushFrame(closure, len(arguments), self.currentLine())
+        return self.run(depth)
+
+    def currentLine(self):
+        if not self.frames:
+            return 0
+        frame = self.frames[-1]
+        return frame.closure.function.chunk.lines[frame.ip-1]
+
+    def error(self, line, message):
+        return LoxRuntimeException(Token(None, "", None, line), message)
+
+    def pushFrame(self, closure, argCount, line):
+        if argCount != closure.function.arity:
+            raise(self.error(line, f"Expected {closure.function.arity} arguments but got {argCount}."))
+        if len(self.frames) >= self.maxFrames:
+            raise(self.error(line, "Stack overflow."))
+        self.frames.append(CallFrame(closure, len(self.stack) - argCount - 1))
+
+    def callValue(self, callee, argCount, line):
+        """Calls callee with its arguments on top of the stack.
+
+        Returns True if a new frame was pushed, False if the call completed
+        and its result has already replaced the callee and arguments.
+        """
+        stack = self.stack
+        if isinstance(callee, VMClosure):
+            self.pushFrame(callee, argCount, line)
+            return True
+        if isinstance(callee, VMBoundMethod):
+            stack[-argCount-1] = callee.receiver
+            self.pushFrame(callee.method, argCount, line)
+            return True
+        if isinstance(callee, LoxClass):
+            stack[-argCount-1] = callee.instanceType(callee)
+            initializer = callee.initializer
+            if initializer:
+                self.pushFrame(initializer, argCount, line)
+                return True
+            if argCount != 0:
+                raise(self.error(line, f"Expected 0 arguments but got {argCount}."))
+            return False
+        if isinstance(callee, NativeMethod) and callee.receiver is None:
+            # Invoked straight off the receiver in the callee's slot.
+            if argCount != callee.argCount:
+                raise(self.error(line, f"Expected {callee.argCount} arguments but got {argCount}."))
+            arguments = stack[len(stack)-argCount:]
+            try:
+                result = callee.callMethod(self, stack[-argCount-1], arguments)
+            except NativeError as e:
+                raise(self.error(line, str(e)))
+            del stack[len(stack)-argCount-1:]
+            stack.append(result)
+            return False
+        if isinstance(callee, LoxCallable):
+            if argCount != callee.arity():
+                raise(self.error(line, f"Expected {callee.arity()} arguments but got {argCount}."))
+            arguments = stack[len(stack)-argCount:]
+            try:
+                result = callee.call(self, arguments)
+            except NativeError as e:
+                raise(self.error(line, str(e)))
+            del stack[len(stack)-argCount-1:]
+            stack.append(result)
+            return False
+        raise(self.error(line, "Can only call functions and classes."))
+
+    def captureUpvalue(self, location):
+        upvalue = self.openUpvalues.get(location)
+        if upvalue is None:
+            upvalue = Upvalue(location)
+            self.openUpvalues[location] = upvalue
+        return upvalue
+
+    def closeUpvalues(self, last):
+        stack = self.stack
+        for location in [l for l in self.openUpvalues if l >= last]:
+            upvalue = self.openUpvalues.pop(location)
+            upvalue.closed = stack[location]
+            upvalue.location = None
+
+    def stringify(self, obj):
+        if obj is None:
+            return "nil"
+        return obj
+
+    def run(self, stopDepth):
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        values = self.globals.values
+
+        frame = self.frames[-1]
+        closure = frame.closure
+        chunk = closure.function.chunk
+        code = chunk.code
+        constants = chunk.constants
+        lines = chunk.lines
+        base = frame.base
+        ip = frame.ip
+
+        while True:
+            op = code[ip]
+            ip += 1
+
+            if op == GET_LOCAL:
+                push(stack[base + code[ip]])
+                ip += 1
+            elif op == CONSTANT:
+                push(constants[code[ip]])
+                ip += 1
+            elif op == SET_LOCAL:
+                stack[base + code[ip]] = stack[-1]
+                ip += 1
+            elif op == POP:
+                pop()
+            elif op == GET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in values:
+                    raise(self.error(lines[ip-2], f"Undefined variable '{name}'."))
+                push(values[name])
+            elif op == ADD:
+                b = pop()
+                a = stack[-1]
+                if type(a) == type(b) and type(a) is not str:
+                    stack[-1] = a + b
+                else:
+                    string = concatenate(a, b)
+                    if string is None:
+                        raise(self.error(lines[ip-1], "Operands must be two numbers or two strings."))
+                    stack[-1] = string
+            elif op == SUBTRACT:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a - b
+            elif op == LESS:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a < b
+            elif op == JUMP_IF_FALSE:
+                value = stack[-1]
+                if value is None or value is False:
+                    ip += code[ip]
+                ip += 1
+            elif op == JUMP:
+                ip += code[ip] + 1
+            elif op == LOOP:
+                ip += 1 - code[ip]
+            elif op == GET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                ip += 1
+                if upvalue.location is None:
+                    push(upvalue.closed)
+                else:
+                    push(stack[upvalue.location])
+            elif op == SET_UPVALUE:
+                upvalue = closure.upvalues[code[ip]]
+                ip += 1
+                if upvalue.location is None:
+                    upvalue.closed = stack[-1]
+                else:
+                    stack[upvalue.location] = stack[-1]
+            elif CALL <= op <= TAIL_INVOKE:
+                # CALL and INVOKE, each with a tail variant laid out in the
+                # same order.
+                tail = op >= TAIL_CALL
+                if tail:
+                    op -= TAIL_CALL - CALL
+
+                argCount = code[ip]
+                ip += 1
+                callee = stack[-argCount-1]
+                if op == INVOKE:
+                    # GET_METHOD left the method above the receiver, or
+                    # None above the field value that replaced it.
+                    del stack[-argCount-1]
+                    if callee is None:
+                        callee = stack[-argCount-1]
+
+                frame.ip = ip
+                if self.callValue(callee, argCount, lines[ip-1]):
+                    if tail:
+                        # Slide the callee's slots down over the caller's and
+                        # let the new frame take the caller's place.
+                        callFrame = self.frames.pop()
+                        if self.openUpvalues:
+                            self.closeUpvalues(base)
+                        stack[base:] = stack[callFrame.base:]
+                        callFrame.base = base
+                        self.frames[-1] = callFrame
+                    frame = self.frames[-1]
+                    closure = frame.closure
+                    chunk = closure.function.chunk
+                    code = chunk.code
+                    constants = chunk.constants
+                    lines = chunk.lines
+                    base = frame.base
+                    ip = 0
+            elif op == RETURN:
+                result = pop()
+                if self.openUpvalues:
+                    self.closeUpvalues(base)
+                del stack[base:]
+                self.frames.pop()
+                if len(self.frames) == stopDepth:
+                    return result
+                push(result)
+
+                frame = self.frames[-1]
+                closure = frame.closure
+                chunk = closure.function.chunk
+                code = chunk.code
+                constants = chunk.constants
+                lines = chunk.lines
+                base = frame.base
+                ip = frame.ip
+            elif op == NIL:
+                push(None)
+            elif op == TRUE:
+                push(True)
+            elif op == FALSE:
+                push(False)
+            elif op == DEFINE_GLOBAL:
+                values[constants[code[ip]]] = pop()
+                ip += 1
+            elif op == SET_GLOBAL:
+                name = constants[code[ip]]
+                ip += 1
+                if name not in values:
+                    raise(self.error(lines[ip-2], f"Undefined variable '{name}'."))
+                values[name] = stack[-1]
+            elif op == GET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise(self.error(lines[ip-2], "Only instances have properties."))
+                index = instance.shape.indexes.get(name)
+                if index is not None:
+                    stack[-1] = instance.values[index]
+                else:
+                    method = instance.klass.findMethod(name)
+                    if method is None:
+                        raise(self.error(lines[ip-2], f"Undefined property '{name}'"))
+                    stack[-1] = method.bind(instance)
+            elif op == SET_PROPERTY:
+                name = constants[code[ip]]
+                ip += 1
+                value = pop()
+                instance = stack[-1]
+                if not isinstance(instance, LoxInstance):
+                    raise(self.error(lines[ip-2], "Only instances have fields."))
+                instance.setField(name, value)
+                stack[-1] = value
+            elif op == GET_METHOD:
+                name = constants[code[ip]]
+                ip += 1
+                receiver = stack[-1]
+                if not isinstance(receiver, LoxInstance):
+                    raise(self.error(lines[ip-2], "Only instances have properties."))
+                index = receiver.shape.indexes.get(name)
+                if index is not None:
+                    # A field holding a function is called without a receiver.
+                    stack[-1] = receiver.values[index]
+                    push(None)
+                else:
+                    method = receiver.klass.findMethod(name)
+                    if method is None:
+                        raise(self.error(lines[ip-2], f"Undefined property '{name}'"))
+                    push(method)
+            elif op == GET_SUPER_METHOD:
+                name = constants[code[ip]]
+                ip += 1
+                method = pop().findMethod(name)
+                if method is None:
+                    raise(self.error(lines[ip-2], f"Undefined property '{name}'."))
+                push(method)
+            elif op == GET_SUPER:
+                name = constants[code[ip]]
+                ip += 1
+                superclass = pop()
+                method = superclass.findMethod(name)
+                if method is None:
+                    raise(self.error(lines[ip-2], f"Undefined property '{name}'."))
+                stack[-1] = method.bind(stack[-1])
+            elif op == EQUAL:
+                b = pop()
+                a = stack[-1]
+                stack[-1] = b is None if a is None else a == b
+            elif op == NOT_EQUAL:
+                b = pop()
+                a = stack[-1]
+                stack[-1] = b is not None if a is None else not a == b
+            elif op == GREATER:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a > b
+            elif op == GREATER_EQUAL:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a >= b
+            elif op == LESS_EQUAL:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a <= b
+            elif op == MULTIPLY:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a * b
+            elif op == DIVIDE:
+                b = pop()
+                a = stack[-1]
+                if not isNumbers(a, b):
+                    raise(self.error(lines[ip-1], "Operands must be numbers."))
+                stack[-1] = a // b
+            elif op == NOT:
+                value = stack[-1]
+                stack[-1] = value is None or value is False
+            elif op == NEGATE:
+                value = stack[-1]
+                if not (isinstance(value, int) or isinstance(value, float)):
+                    raise(self.error(lines[ip-1], "Operand must be a number."))
+                stack[-1] = -value
+            elif op == PRINT:
+                print(self.stringify(pop()))
+            elif op == CLOSURE:
+                function = constants[code[ip]]
+                ip += 1
+                upvalues = []
+                for i in range(function.upvalueCount):
+                    isLocal = code[ip]
+                    index = code[ip+1]
+                    ip += 2
+                    if isLocal:
+                        upvalues.append(self.captureUpvalue(base + index))
+                    else:
+                        upvalues.append(closure.upvalues[index])
+                push(VMClosure(function, upvalues))
+            elif op == CLOSE_UPVALUE:
+                self.closeUpvalues(len(stack) - 1)
+                pop()
+            elif op == CLASS:
+                push(LoxClass(constants[code[ip]], None, {}))
+                ip += 1
+            elif op == INHERIT:
+                subclass = pop()
+                superclass = stack[-1]
+                if not isinstance(superclass, LoxClass):
+                    raise(self.error(lines[ip-1], "Superclass must be a class."))
+                subclass.inherit(superclass)
+            elif op == METHOD:
+                method = pop()
+                stack[-1].defineMethod(constants[code[ip]], method)
+                ip += 1
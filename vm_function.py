@@ -0,0 +1,56 @@
+#!/usr/local/bin/python3
+
+from chunk import Chunk
+from lox_callable import LoxCallable
+
+class VMFunction:
+    def __init__(self, name):
+        self.name = name
+        self.arity = 0
+        self.upvalueCount = 0
+        self.chunk = Chunk()
+
+    def __str__(self):
+        if self.name is None:
+            return "<script>"
+        return f"<fn {self.name}>"
+
+class Upvalue:
+    def __init__(self, location):
+        # Stack index while the variable is live, None once closed over.
+        self.location = location
+        self.closed = None
+
+class VMClosure(LoxCallable):
+    def __init__(self, function, upvalues):
+        self.function = function
+        self.upvalues = upvalues
+
+    def bind(self, instance):
+        return VMBoundMethod(instance, self)
+
+    def call(self, interpreter, arguments):
+        return interpreter.callFunction(self, self, arguments)
+
+    def callMethod(self, interpreter, instance, arguments):
+        return interpreter.callFunction(self, instance, arguments)
+
+    def arity(self):
+        return self.function.arity
+
+    def __str__(self):
+        return str(self.function)
+
+class VMBoundMethod(LoxCallable):
+    def __init__(self, receiver, method):
+        self.receiver = receiver
+        self.method = method
+
+    def call(self, interpreter, arguments):
+        return interpreter.callFunction(self.method, self.receiver, arguments)
+
+    def arity(self):
+        return self.method.function.arity
+
+    def __str__(self):
+        return str(self.method)